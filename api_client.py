@@ -0,0 +1,124 @@
+import threading
+from urllib.parse import urlparse
+
+# المهلة الافتراضية لكل نوع من الطلبات (بالثواني): (مهلة الاتصال، مهلة القراءة)
+DEFAULT_TIMEOUTS = {
+    "default": (5, 10),
+    "login": (5, 10),
+    "content": (5, 10),
+    "messages": (5, 10),
+    "users": (5, 10),
+    "upload": (5, 30),  # زيادة المهلة للرفع
+    "file": (5, 20),
+}
+
+
+class ApiClient:
+    """عميل HTTP مشترك يعيد استخدام الاتصالات عبر requests.Session
+
+    الجلسة (ومكتبة requests نفسها) تنشأ عند أول طلب حتى لا تؤخر بدء التطبيق.
+    """
+
+    def __init__(self, base_url, pool_size=10, retries=3, backoff_factor=0.5, timeouts=None):
+        self.base_url = base_url.rstrip("/")
+        self.host = urlparse(self.base_url).netloc
+        self.timeouts = dict(DEFAULT_TIMEOUTS)
+        if timeouts:
+            self.timeouts.update(timeouts)
+        self.pool_size = pool_size
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self._session = None
+        self._lock = threading.Lock()
+        # العميل الذي يملك الاتصالات عند إنشاء هذا العميل عبر with_auth
+        self._pool_owner = None
+        # TokenAuth يضيف رمز الجلسة لكل طلب، و on_unauthorized تستدعى مرة عند رفض الرمز نهائياً
+        self.auth = None
+        self.on_unauthorized = None
+
+    def with_auth(self, auth=None, on_unauthorized=None):
+        """عميل لجلسة مستخدم واحدة يشارك اتصالات هذا العميل ويملك رمزه الخاص
+
+        في وضع الويب تخدم العملية عدة صفحات، فلا يجوز أن يكون الرمز مشتركاً بينها.
+        """
+        client = ApiClient(self.base_url, self.pool_size, self.retries, self.backoff_factor, self.timeouts)
+        client._pool_owner = self._pool_owner or self
+        client.auth = auth
+        client.on_unauthorized = on_unauthorized
+        return client
+
+    @property
+    def session(self):
+        if self._pool_owner is not None:
+            return self._pool_owner.session
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._create_session()
+        return self._session
+
+    def _create_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        retries = self.retries
+        # إعادة المحاولة فقط للطلبات الآمنة (GET/DELETE...) وعند أخطاء السيرفر المؤقتة
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+
+        session = requests.Session()
+        session.headers.update({"Connection": "keep-alive"})
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def url(self, path):
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method, path, endpoint="default", authenticate=True, **kwargs):
+        kwargs.setdefault("timeout", self.timeouts.get(endpoint, self.timeouts["default"]))
+        url = self.url(path)
+        # الرمز لا يرسل أبداً لخوادم أخرى (مثل ملفات الخطوط)
+        auth = self.auth if authenticate and urlparse(url).netloc == self.host else None
+        if auth is None:
+            return self.session.request(method, url, **kwargs)
+
+        auth.ensure_fresh()
+        token = auth.token
+        headers = kwargs.pop("headers", None)
+        response = self.session.request(method, url, headers=auth.headers(headers), **kwargs)
+        if response.status_code != 401 or not token:
+            return response
+        # الرمز مرفوض: تجديد وإعادة الطلب مرة واحدة، ثم إنهاء الجلسة
+        if auth.refresh(expired_token=token):
+            response.close()
+            response = self.session.request(method, url, headers=auth.headers(headers), **kwargs)
+            if response.status_code != 401:
+                return response
+        auth.clear()
+        if self.on_unauthorized:
+            self.on_unauthorized()
+        return response
+
+    def get(self, path, endpoint="default", authenticate=True, **kwargs):
+        return self.request("GET", path, endpoint, authenticate, **kwargs)
+
+    def post(self, path, endpoint="default", authenticate=True, **kwargs):
+        return self.request("POST", path, endpoint, authenticate, **kwargs)
+
+    def delete(self, path, endpoint="default", authenticate=True, **kwargs):
+        return self.request("DELETE", path, endpoint, authenticate, **kwargs)
+
+    def close(self):
+        if self._pool_owner is None and self._session is not None:
+            self._session.close()
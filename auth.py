@@ -0,0 +1,161 @@
+import json
+import os
+import threading
+import time
+
+from storage import app_data_dir
+
+
+class TokenStore:
+    """حفظ رمز الجلسة على القرص في ملف لا يقرؤه إلا المستخدم الحالي"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(app_data_dir(), "session.json")
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save(self, data):
+        tmp_path = self.path + ".tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class ClientStorageTokenStore:
+    """حفظ رمز الجلسة في تخزين العميل (page.client_storage) في وضع الويب، فلكل متصفح رمزه"""
+
+    KEY = "session"
+
+    def __init__(self, storage):
+        self.storage = storage
+
+    def load(self):
+        try:
+            return json.loads(self.storage.get(self.KEY) or "{}")
+        except (TypeError, ValueError):
+            return {}
+
+    def save(self, data):
+        self.storage.set(self.KEY, json.dumps(data))
+
+    def clear(self):
+        self.storage.remove(self.KEY)
+
+
+class TokenAuth:
+    """رمز الجلسة الذي يضيفه ApiClient لكل طلب، مع تجديده قبل انتهاء صلاحيته
+
+    login      POST {"code", "password"}        → بيانات المستخدم + {"token", "expires_in", "refresh_token"}
+    refresh    POST {"refresh_token"} + الرمز الحالي → {"token", "expires_in", "refresh_token"}
+    me         GET بالرمز                         → بيانات المستخدم (تحقق رخيص عند إعادة التشغيل)
+    """
+
+    LOGIN_PATH = "api.php?table=users&action=login"
+    REFRESH_PATH = "api.php?table=users&action=refresh"
+    ME_PATH = "api.php?table=users&action=me"
+
+    def __init__(self, api, store=None, refresh_margin=60):
+        self.api = api
+        self.store = store or TokenStore()
+        # التجديد قبل انتهاء الصلاحية بهذه المدة (بالثواني)
+        self.refresh_margin = refresh_margin
+        self._session = self.store.load()
+        self._lock = threading.Lock()
+
+    @property
+    def token(self):
+        return self._session.get("token")
+
+    @property
+    def expires_at(self):
+        return self._session.get("expires_at")
+
+    def _update(self, data):
+        """حفظ الرمز من استجابة login أو refresh؛ يعيد False إذا لم يرسل السيرفر رمزاً"""
+        token = data.get("token") if isinstance(data, dict) else None
+        if not token:
+            return False
+        session = {"token": token, "refresh_token": data.get("refresh_token") or self._session.get("refresh_token")}
+        if data.get("expires_in"):
+            session["expires_at"] = time.time() + float(data["expires_in"])
+        elif data.get("expires_at"):
+            session["expires_at"] = float(data["expires_at"])
+        self._session = session
+        self.store.save(session)
+        return True
+
+    def headers(self, headers=None):
+        headers = dict(headers or {})
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        return headers
+
+    def login(self, code, password):
+        """تسجيل الدخول بالكود وكلمة المرور وحفظ الرمز إن وجد؛ يعيد الاستجابة كما هي"""
+        response = self.api.post(
+            self.LOGIN_PATH,
+            endpoint="login",
+            authenticate=False,
+            json={"code": code, "password": password},
+            headers={"Content-Type": "application/json"},
+        )
+        if response.status_code == 200:
+            try:
+                self._update(response.json())
+            except ValueError:
+                pass
+        return response
+
+    def verify(self):
+        """بيانات المستخدم إذا كان الرمز المحفوظ صالحاً، أو None"""
+        if not self.token:
+            return None
+        response = self.api.get(self.ME_PATH, endpoint="login", headers={"Content-Type": "application/json"})
+        if response.status_code != 200:
+            return None
+        try:
+            return response.json()
+        except ValueError:
+            return None
+
+    def ensure_fresh(self):
+        expires_at = self.expires_at
+        if self.token and expires_at and time.time() >= expires_at - self.refresh_margin:
+            self.refresh(expired_token=self.token)
+
+    def refresh(self, expired_token=None):
+        """تجديد الرمز مرة واحدة حتى مع تزامن عدة طلبات؛ يعيد True عند وجود رمز صالح"""
+        with self._lock:
+            if expired_token is not None and self.token != expired_token:
+                # طلب آخر جدد الرمز أثناء الانتظار
+                return bool(self.token)
+            if not self.token:
+                return False
+            try:
+                response = self.api.post(
+                    self.REFRESH_PATH,
+                    endpoint="login",
+                    authenticate=False,
+                    json={"refresh_token": self._session.get("refresh_token")},
+                    headers=self.headers({"Content-Type": "application/json"}),
+                )
+                return response.status_code == 200 and self._update(response.json())
+            except ValueError:
+                return False
+
+    def clear(self):
+        with self._lock:
+            self._session = {}
+            self.store.clear()
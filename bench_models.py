@@ -0,0 +1,77 @@
+"""قياس حجم الرسائل في الذاكرة وزمن تحويلها من JSON: الصنف القديم بـ __dict__ مقابل الصنف الحالي بـ __slots__
+
+التشغيل: python bench_models.py --count 50000
+"""
+import argparse
+import time
+import tracemalloc
+
+from message import Message
+
+
+class DictMessage:
+    """نسخة من صنف الرسالة السابق (__dict__ لكل عنصر وتحويل عنصر بعنصر) للمقارنة"""
+
+    def __init__(self, id, content, sender_id, username, department, division, timestamp):
+        self.id = id
+        self.content = content
+        self.sender_id = sender_id
+        self.username = username
+        self.department = department
+        self.division = division
+        self.timestamp = timestamp
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(
+            data['id'],
+            data['content'],
+            data['sender_id'],
+            data['username'],
+            data.get('department', ''),
+            data.get('division', ''),
+            data['timestamp']
+        )
+
+
+def sample_items(count):
+    return [
+        {
+            "id": str(1700000000000 + i),
+            "content": f"رسالة رقم {i}",
+            "sender_id": str(i % 40),
+            "username": f"user{i % 40}",
+            "department": "عربي",
+            "division": "أولى",
+            "timestamp": "2024-01-01 10:00:00",
+        }
+        for i in range(count)
+    ]
+
+
+def measure(label, decode, items):
+    started = time.perf_counter()
+    decode(items)
+    elapsed = time.perf_counter() - started
+
+    # قياس الذاكرة في تشغيل منفصل لأن tracemalloc يبطئ التنفيذ
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    decoded = decode(items)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    # الذاكرة المحجوزة للكائنات نفسها (النصوص مشتركة مع القاموس الأصلي)
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    print(f"{label:<28} {elapsed * 1000:8.1f} ms   {allocated / len(decoded):6.0f} B/message")
+    return decoded
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=50000)
+    args = parser.parse_args()
+
+    items = sample_items(args.count)
+    measure("dict + from_json", lambda data: [DictMessage.from_json(item) for item in data], items)
+    measure("slots + from_json_list", Message.from_json_list, items)
+    measure("slots + parse_dates", lambda data: Message.from_json_list(data, parse_dates=True), items)
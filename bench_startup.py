@@ -0,0 +1,48 @@
+"""قياس زمن بدء التطبيق: استيراد main.py في عملية جديدة، والمكتبات التي أجل تحميلها
+
+التشغيل: python bench_startup.py --runs 5
+زمن ظهور أول شاشة داخل التطبيق يسجل في السجل "alson" عند التشغيل: first screen (...) after N ms
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+deferred = {name: name in sys.modules for name in ("requests", "webbrowser")}
+started = time.perf_counter()
+import requests
+requests_cost = time.perf_counter() - started
+print(json.dumps({"import": elapsed, "deferred": deferred, "requests": requests_cost}))
+"""
+
+
+def run_once():
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    imports = [r["import"] * 1000 for r in results]
+    deferred = [r["requests"] * 1000 for r in results]
+    print(f"import main       median={statistics.median(imports):7.1f} ms  min={min(imports):7.1f} ms")
+    print(f"requests deferred median={statistics.median(deferred):7.1f} ms (paid on first network call)")
+    for name, loaded in results[-1]["deferred"].items():
+        print(f"  {name:<10} {'loaded at startup' if loaded else 'deferred'}")
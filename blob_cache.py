@@ -0,0 +1,196 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from storage import app_data_dir
+
+
+class FetchCancelled(Exception):
+    """أُلغي تحميل الملف قبل اكتماله"""
+
+
+def _until_cancelled(chunks, cancel):
+    for chunk in chunks:
+        if cancel.is_set():
+            raise FetchCancelled()
+        yield chunk
+
+
+class BlobCache:
+    """ملفات المحتوى المعروضة على القرص بحد أقصى للحجم، مع إخراج الأقدم استخداماً وتثبيت الملفات للاستخدام بدون إنترنت"""
+
+    def __init__(self, directory=None, max_bytes=200 * 1024 * 1024):
+        self._directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # المجلد والفهرس ينشآن عند أول استخدام حتى لا يدفع بدء التطبيق ثمنهما
+        self._conn = None
+        self._open_lock = threading.Lock()
+
+    @property
+    def directory(self):
+        if self._directory is None:
+            self._directory = app_data_dir("blobs")
+        return self._directory
+
+    @property
+    def _db(self):
+        if self._conn is None:
+            with self._open_lock:
+                if self._conn is None:
+                    self._conn = self._connect()
+        return self._conn
+
+    def _connect(self):
+        db = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"), check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS blobs ("
+            " key TEXT PRIMARY KEY,"
+            " filename TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL,"
+            " pinned INTEGER NOT NULL DEFAULT 0)"
+        )
+        db.commit()
+        return db
+
+    @staticmethod
+    def key_for(content_id, file_path):
+        return hashlib.sha1(f"{content_id}|{file_path}".encode("utf-8")).hexdigest()
+
+    def path(self, key):
+        """المسار المحلي للملف إن كان مخزناً، أو None"""
+        with self._lock:
+            row = self._db.execute("SELECT filename FROM blobs WHERE key = ?", (key,)).fetchone()
+            if not row:
+                return None
+            path = os.path.join(self.directory, row[0])
+            if not os.path.exists(path):
+                self._db.execute("DELETE FROM blobs WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE blobs SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return path
+
+    def _store(self, key, chunks, suffix):
+        # يكتب كل جزء على القرص ثم يعيده، ولا يسجل الملف إلا بعد اكتماله
+        filename = key + suffix
+        tmp_path = os.path.join(self.directory, f"{filename}.{uuid.uuid4().hex}.tmp")
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+                    yield chunk
+            os.replace(tmp_path, os.path.join(self.directory, filename))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO blobs (key, filename, size, last_access) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET filename = excluded.filename, size = excluded.size,"
+                " last_access = excluded.last_access",
+                (key, filename, size, time.time()),
+            )
+            self._db.commit()
+            # الملف الجديد لا يخرج حتى لو كان أكبر من الحد، فالمسار الذي نعيده يجب أن يبقى موجوداً
+            self._evict(keep=key)
+
+    def put(self, key, chunks, suffix=""):
+        """حفظ الملف من مولد أجزاء دون تحميله كاملاً في الذاكرة"""
+        for _ in self._store(key, chunks, suffix):
+            pass
+        return os.path.join(self.directory, key + suffix)
+
+    def fetch(self, key, url, api, suffix="", cancel=None):
+        """المسار المحلي للملف، مع تحميله من url عند عدم وجوده
+
+        cancel (threading.Event) يوقف التحميل بين الأجزاء ويرمي FetchCancelled.
+        """
+        path = self.path(key)
+        if path:
+            return path
+        with api.get(url, endpoint="file", stream=True) as response:
+            response.raise_for_status()
+            chunks = response.iter_content(64 * 1024)
+            if cancel is not None:
+                chunks = _until_cancelled(chunks, cancel)
+            return self.put(key, chunks, suffix)
+
+    def copy_to(self, key, url, api, target, cancel=None, chunk_size=64 * 1024):
+        """كتابة الملف في target: من القرص إن كان محفوظاً، وإلا من السيرفر دون حفظه في المخزن
+
+        للملفات التي لا تلزم إلا مرة واحدة (مصدر الصورة المصغرة) حتى لا تخرج الملفات التي فتحها المستخدم.
+        """
+        path = self.path(key)
+        if path:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    target.write(chunk)
+            return
+        with api.get(url, endpoint="file", stream=True) as response:
+            response.raise_for_status()
+            chunks = response.iter_content(chunk_size)
+            if cancel is not None:
+                chunks = _until_cancelled(chunks, cancel)
+            for chunk in chunks:
+                target.write(chunk)
+
+    def stream(self, key, url, api, suffix="", cancel=None, chunk_size=64 * 1024):
+        """أجزاء الملف بالترتيب: من القرص إن كان محفوظاً، وإلا من السيرفر مع حفظه أثناء التحميل"""
+        path = self.path(key)
+        if path:
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(chunk_size), b""):
+                    if cancel is not None and cancel.is_set():
+                        raise FetchCancelled()
+                    yield chunk
+            return
+        with api.get(url, endpoint="file", stream=True) as response:
+            response.raise_for_status()
+            chunks = response.iter_content(chunk_size)
+            if cancel is not None:
+                chunks = _until_cancelled(chunks, cancel)
+            yield from self._store(key, chunks, suffix)
+
+    def pin(self, key, pinned=True):
+        with self._lock:
+            self._db.execute("UPDATE blobs SET pinned = ? WHERE key = ?", (1 if pinned else 0, key))
+            self._db.commit()
+            if not pinned:
+                self._evict()
+
+    def is_pinned(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT pinned FROM blobs WHERE key = ?", (key,)).fetchone()
+        return bool(row and row[0])
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def _evict(self, keep=None):
+        # الملفات المثبتة لا تحذف ولا تحسب ضمن ما يمكن إخراجه
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._db.execute(
+            "SELECT key, filename, size FROM blobs WHERE pinned = 0 AND key != ? ORDER BY last_access", (keep or "",)
+        ).fetchall()
+        for key, filename, size in rows:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError:
+                pass
+            self._db.execute("DELETE FROM blobs WHERE key = ?", (key,))
+            total -= size
+        self._db.commit()
@@ -0,0 +1,213 @@
+import csv
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+USER_FIELDS = ("code", "username", "department", "division", "role", "password")
+
+
+class BulkResult:
+    """نتيجة عملية جماعية: المفاتيح التي نجحت والأخطاء [(المفتاح أو رقم السطر، السبب)]"""
+
+    def __init__(self):
+        self.succeeded = []
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def ok(self, keys):
+        with self._lock:
+            self.succeeded.extend(keys)
+
+    def fail(self, key, reason):
+        with self._lock:
+            self.errors.append((key, reason))
+
+
+def iter_user_rows(path, existing_codes=()):
+    """يقرأ ملف CSV سطراً بسطر ويعيد (رقم السطر، بيانات المستخدم، سبب الرفض أو None)"""
+    seen = set(existing_codes)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = [field for field in USER_FIELDS if field not in (reader.fieldnames or [])]
+        if missing:
+            yield 1, None, f"أعمدة ناقصة: {', '.join(missing)}"
+            return
+        for line, row in enumerate(reader, start=2):
+            record = {field: (row.get(field) or "").strip() for field in USER_FIELDS}
+            empty = [field for field in USER_FIELDS if not record[field]]
+            if empty:
+                yield line, record, f"حقول فارغة: {', '.join(empty)}"
+            elif record["code"] in seen:
+                yield line, record, f"الكود {record['code']} مكرر"
+            else:
+                seen.add(record["code"])
+                yield line, record, None
+
+
+class BulkUsers:
+    """إضافة وحذف المستخدمين على دفعات مع حد لعدد الطلبات المتزامنة
+
+    يستخدم action=add_batch و action=delete_batch إن دعمهما السيرفر، وإلا طلباً لكل مستخدم.
+    لا تعتبر الدفعة منفذة إلا إذا أكدها الرد ({"errors": [...]} للإضافة و {"deleted": [...]} للحذف)،
+    لأن السيرفر القديم قد يتجاهل action ويعيد 200 دون أن ينفذ شيئاً.
+    """
+
+    def __init__(self, api, batch_size=50, max_concurrent=4):
+        self.api = api
+        self.batch_size = batch_size
+        self.max_concurrent = max_concurrent
+        self.batch_supported = {"add": True, "delete": True}
+
+    def _post_batch(self, action, payload):
+        """استجابة الدفعة، أو None إذا لم يدعم السيرفر الدفعات"""
+        if not self.batch_supported[action]:
+            return None
+        send = self.api.post if action == "add" else self.api.delete
+        response = send(
+            f"api.php?table=users&action={action}_batch",
+            endpoint="users",
+            json=payload,
+            headers={"Content-Type": "application/json"},
+        )
+        if response.status_code in (400, 404, 405, 501):
+            self.batch_supported[action] = False
+            return None
+        return response
+
+    def _confirmed(self, action, response, key):
+        """القائمة key من رد الدفعة، أو None (مع إيقاف الدفعات) إذا لم يؤكد الرد تنفيذها"""
+        try:
+            data = response.json()
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or not isinstance(data.get(key), list):
+            self.batch_supported[action] = False
+            return None
+        return data[key]
+
+    def _add_batch(self, rows, result):
+        try:
+            response = self._post_batch("add", {"users": [record for line, record in rows]})
+        except Exception as e:
+            for line, record in rows:
+                result.fail(line, str(e))
+            return
+        if response is None:
+            for line, record in rows:
+                self._add_one(line, record, result)
+            return
+        if response.status_code != 200:
+            for line, record in rows:
+                result.fail(line, response.text)
+            return
+        # السيرفر قد يرفض بعض الصفوف: {"errors": [{"code": ..., "error": ...}]}
+        errors = self._confirmed("add", response, "errors")
+        if errors is None:
+            for line, record in rows:
+                self._add_one(line, record, result)
+            return
+        rejected = {e.get("code"): e.get("error", "") for e in errors if isinstance(e, dict)}
+        for line, record in rows:
+            if record["code"] in rejected:
+                result.fail(line, rejected[record["code"]])
+            else:
+                result.ok([record["code"]])
+
+    def _add_one(self, line, record, result):
+        try:
+            response = self.api.post(
+                "api.php?table=users&action=add",
+                endpoint="users",
+                json=record,
+                headers={"Content-Type": "application/json"},
+            )
+            if response.status_code == 200:
+                result.ok([record["code"]])
+            else:
+                result.fail(line, response.text)
+        except Exception as e:
+            result.fail(line, str(e))
+
+    def import_csv(self, path, existing_codes=(), progress=None):
+        """يقرأ الملف ويرسل الصفوف الصالحة على دفعات أثناء القراءة؛ progress(عدد الصفوف المعالجة)"""
+        result = BulkResult()
+        # لا تقرأ دفعات أكثر مما يمكن إرساله حتى لا يحمل الملف كله في الذاكرة
+        slots = threading.BoundedSemaphore(self.max_concurrent * 2)
+        processed = [0]
+        processed_lock = threading.Lock()
+
+        def run(rows):
+            try:
+                self._add_batch(rows, result)
+            finally:
+                slots.release()
+                with processed_lock:
+                    processed[0] += len(rows)
+                    count = processed[0]
+                if progress:
+                    progress(count)
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="bulk-users") as pool:
+            batch = []
+            for line, record, error in iter_user_rows(path, existing_codes):
+                if error:
+                    result.fail(line, error)
+                    continue
+                batch.append((line, record))
+                if len(batch) == self.batch_size:
+                    slots.acquire()
+                    pool.submit(run, batch)
+                    batch = []
+            if batch:
+                slots.acquire()
+                pool.submit(run, batch)
+        result.errors.sort(key=lambda error: error[0])
+        return result
+
+    def _delete_batch(self, codes, result):
+        try:
+            response = self._post_batch("delete", {"codes": codes})
+            if response is None:
+                for code in codes:
+                    self._delete_one(code, result)
+            elif response.status_code == 200:
+                deleted = self._confirmed("delete", response, "deleted")
+                if deleted is None:
+                    for code in codes:
+                        self._delete_one(code, result)
+                    return
+                deleted = set(deleted)
+                result.ok([code for code in codes if code in deleted])
+                for code in codes:
+                    if code not in deleted:
+                        result.fail(code, "لم يؤكد السيرفر الحذف")
+            else:
+                for code in codes:
+                    result.fail(code, response.text)
+        except Exception as e:
+            for code in codes:
+                result.fail(code, str(e))
+
+    def _delete_one(self, code, result):
+        try:
+            response = self.api.delete(
+                "api.php?table=users",
+                endpoint="users",
+                json={"code": code},
+                headers={"Content-Type": "application/json"},
+            )
+            if response.status_code == 200:
+                result.ok([code])
+            else:
+                result.fail(code, response.text)
+        except Exception as e:
+            result.fail(code, str(e))
+
+    def delete(self, codes, progress=None):
+        result = BulkResult()
+        codes = list(codes)
+        batches = [codes[i:i + self.batch_size] for i in range(0, len(codes), self.batch_size)]
+        with ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="bulk-users") as pool:
+            for _ in pool.map(lambda batch: self._delete_batch(batch, result), batches):
+                if progress:
+                    progress(len(result.succeeded) + len(result.errors))
+        return result
@@ -0,0 +1,108 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+
+def estimate_size(value):
+    """تقدير تقريبي لحجم القيمة في الذاكرة بالبايت"""
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    size = sys.getsizeof(value)
+    if hasattr(value, "__dict__"):
+        size += sum(sys.getsizeof(v) for v in vars(value).values())
+    for slot in getattr(type(value), "__slots__", ()):
+        size += sys.getsizeof(getattr(value, slot, None))
+    return size
+
+
+class LRUCache:
+    """ذاكرة مؤقتة بمدة صلاحية لكل مساحة أسماء وحد أقصى للعناصر والحجم مع إخراج الأقدم استخداماً"""
+
+    def __init__(self, max_entries=128, max_bytes=None, ttls=None, default_ttl=None, sizeof=estimate_size):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttls = dict(ttls or {})
+        self.default_ttl = default_ttl
+        self.sizeof = sizeof
+        self.total_bytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+        self._data = OrderedDict()
+        self._lock = threading.RLock()
+
+    def namespace(self, name):
+        return CacheNamespace(self, name)
+
+    def get(self, namespace, key, default=None):
+        with self._lock:
+            entry = self._data.get((namespace, key))
+            if entry is None:
+                self.stats["misses"] += 1
+                return default
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove((namespace, key))
+                self.stats["expirations"] += 1
+                self.stats["misses"] += 1
+                return default
+            self._data.move_to_end((namespace, key))
+            self.stats["hits"] += 1
+            return value
+
+    def set(self, namespace, key, value):
+        ttl = self.ttls.get(namespace, self.default_ttl)
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        size = self.sizeof(value) if self.max_bytes else 0
+        with self._lock:
+            self._remove((namespace, key))
+            self._data[(namespace, key)] = (value, expires_at, size)
+            self.total_bytes += size
+            self._evict()
+
+    def delete(self, namespace, key):
+        with self._lock:
+            self._remove((namespace, key))
+
+    def clear(self, namespace=None):
+        with self._lock:
+            for full_key in [k for k in self._data if namespace is None or k[0] == namespace]:
+                self._remove(full_key)
+
+    def __len__(self):
+        return len(self._data)
+
+    def _remove(self, full_key):
+        entry = self._data.pop(full_key, None)
+        if entry is not None:
+            self.total_bytes -= entry[2]
+
+    def _evict(self):
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes and self.total_bytes > self.max_bytes and len(self._data) > 1)
+        ):
+            full_key = next(iter(self._data))
+            self._remove(full_key)
+            self.stats["evictions"] += 1
+
+
+class CacheNamespace:
+    """واجهة شبيهة بالقاموس لمساحة أسماء واحدة داخل LRUCache"""
+
+    def __init__(self, cache, name):
+        self.cache = cache
+        self.name = name
+
+    def get(self, key, default=None):
+        return self.cache.get(self.name, key, default)
+
+    def __setitem__(self, key, value):
+        self.cache.set(self.name, key, value)
+
+    def pop(self, key):
+        self.cache.delete(self.name, key)
+
+    def clear(self):
+        self.cache.clear(self.name)
@@ -0,0 +1,253 @@
+import json
+import threading
+
+
+class TransportError(Exception):
+    """فشل السيرفر في تنفيذ طلب الرسائل"""
+
+    def __init__(self, response):
+        super().__init__(response.text)
+        self.response = response
+
+
+class TransportUnsupported(Exception):
+    """السيرفر لا يدعم طريقة النقل المطلوبة"""
+
+
+def _messages_url(department, division, since=None, before=None, limit=None):
+    url = "api.php?table=messages"
+    if department and division:
+        url += f"&department={department}&division={division}"
+    if since is not None:
+        url += f"&since={since}"
+    if before is not None:
+        url += f"&before={before}"
+    if limit is not None:
+        url += f"&limit={limit}"
+    return url
+
+
+class PollingTransport:
+    """النقل الافتراضي: طلب عادي كل interval ثانية"""
+
+    name = "polling"
+
+    def __init__(self, api, interval=10):
+        self.api = api
+        self.interval = interval
+        self.supported = True
+
+    def fetch(self, department, division, since=None, before=None, limit=None):
+        """limit يحدد عدد أحدث الرسائل، و before لجلب الرسائل الأقدم من مؤشر"""
+        response = self.api.get(
+            _messages_url(department, division, since, before, limit),
+            endpoint="messages",
+            headers={"Content-Type": "application/json"},
+        )
+        if response.status_code != 200:
+            raise TransportError(response)
+        return response.json()
+
+    def wait(self, department, division, since=None):
+        # في وضع الاستطلاع العادي الانتظار يتم في المجدول وليس هنا
+        return self.fetch(department, division, since)
+
+    def send(self, payload):
+        response = self.api.post(
+            "api.php?table=messages",
+            endpoint="messages",
+            json=payload,
+            headers={"Content-Type": "application/json"},
+        )
+        if response.status_code != 200:
+            raise TransportError(response)
+        return response
+
+    def close(self):
+        pass
+
+
+class LongPollTransport(PollingTransport):
+    """الاستطلاع الطويل: السيرفر يحتفظ بالطلب حتى وصول رسالة جديدة أو انتهاء wait ثانية
+
+    يجب أن يرد السيرفر بالترويسة X-Long-Poll ليتم اعتباره داعماً لهذا الوضع،
+    وإلا سيتحول العميل إلى طلبات متتالية بلا توقف.
+    """
+
+    name = "long-poll"
+
+    def __init__(self, api, wait_seconds=25, interval=0.5):
+        super().__init__(api, interval)
+        self.wait_seconds = wait_seconds
+
+    def wait(self, department, division, since=None):
+        connect_timeout = self.api.timeouts["messages"][0]
+        response = self.api.get(
+            _messages_url(department, division, since) + f"&wait={self.wait_seconds}",
+            endpoint="messages",
+            headers={"Content-Type": "application/json"},
+            timeout=(connect_timeout, self.wait_seconds + 10),
+        )
+        if response.status_code != 200:
+            raise TransportError(response)
+        if "X-Long-Poll" not in response.headers:
+            raise TransportUnsupported(self.name)
+        return response.json()
+
+
+class SseTransport(PollingTransport):
+    """Server-Sent Events: اتصال واحد مفتوح يدفع فيه السيرفر الرسائل الجديدة"""
+
+    name = "sse"
+
+    def __init__(self, api, read_timeout=60, interval=0.5):
+        super().__init__(api, interval)
+        self.read_timeout = read_timeout
+        self._stream = None
+        self._lines = None
+        self._key = None
+        # قارئ واحد للاتصال في كل مرة (مولد الأسطر لا يقبل القراءة من خيطين)
+        self._read_lock = threading.Lock()
+
+    def _open(self, department, division, since):
+        self.close()
+        connect_timeout = self.api.timeouts["messages"][0]
+        response = self.api.get(
+            _messages_url(department, division, since) + "&stream=sse",
+            endpoint="messages",
+            headers={"Accept": "text/event-stream", "Accept-Encoding": "identity"},
+            timeout=(connect_timeout, self.read_timeout),
+            stream=True,
+        )
+        if response.status_code != 200:
+            response.close()
+            raise TransportError(response)
+        if not response.headers.get("Content-Type", "").startswith("text/event-stream"):
+            response.close()
+            raise TransportUnsupported(self.name)
+        self._stream = response
+        # قراءة سطر بسطر مباشرة لأن iter_lines تنتظر امتلاء المخزن قبل إرجاع أي حدث
+        self._lines = (line.decode("utf-8").rstrip("\r\n") for line in iter(response.raw.readline, b""))
+        self._key = (department, division)
+
+    def wait(self, department, division, since=None):
+        with self._read_lock:
+            return self._wait(department, division, since)
+
+    def _wait(self, department, division, since):
+        if self._stream is None or self._key != (department, division):
+            self._open(department, division, since)
+        # requests يحمل عند أول طلب وليس عند بدء التطبيق
+        import requests
+        from urllib3.exceptions import HTTPError
+
+        stream, lines = self._stream, self._lines
+        data = []
+        try:
+            for line in lines:
+                if line:
+                    # تجاهل التعليقات (نبضات الإبقاء على الاتصال) وحقول event/id
+                    if line.startswith("data:"):
+                        data.append(line[5:].strip())
+                    continue
+                if data:
+                    break
+            else:
+                # أغلق السيرفر الاتصال (أو أغلقه close من خيط آخر)، سيعاد فتحه في الاستدعاء التالي
+                self._close_stream(stream)
+                return []
+        except (requests.RequestException, HTTPError, OSError, ValueError) as e:
+            closed = stream is not self._stream
+            self._close_stream(stream)
+            if closed:
+                # أغلق الاتصال عمداً عند مغادرة الشات: لا خطأ ولا رسائل
+                return []
+            raise requests.ConnectionError(e)
+        if not data:
+            return []
+        payload = json.loads("\n".join(data))
+        return payload if isinstance(payload, list) else [payload]
+
+    def _close_stream(self, stream):
+        # لا نغلق اتصالاً أحدث فتحه استدعاء آخر
+        if stream is self._stream:
+            self.close()
+        elif stream is not None:
+            stream.close()
+
+    def close(self):
+        """إغلاق الاتصال؛ يمكن استدعاؤه من خيط آخر لإنهاء wait المعلقة فوراً"""
+        stream = self._stream
+        self._stream = None
+        self._lines = None
+        self._key = None
+        if stream is not None:
+            stream.close()
+
+
+class FallbackTransport:
+    """يستخدم primary ويتحول إلى fallback عند عدم الدعم أو تكرار فشل الاتصال"""
+
+    def __init__(self, primary, fallback, max_failures=3):
+        self.primary = primary
+        self.fallback = fallback
+        self.max_failures = max_failures
+        self.failures = 0
+
+    @property
+    def supported(self):
+        return True
+
+    @property
+    def active(self):
+        return self.primary if self.primary.supported else self.fallback
+
+    @property
+    def name(self):
+        return self.active.name
+
+    @property
+    def interval(self):
+        return self.active.interval
+
+    def fetch(self, department, division, since=None, before=None, limit=None):
+        return self.fallback.fetch(department, division, since, before, limit)
+
+    def wait(self, department, division, since=None):
+        if self.primary.supported:
+            try:
+                data = self.primary.wait(department, division, since)
+                self.failures = 0
+                return data
+            except TransportUnsupported:
+                self.primary.supported = False
+                self.primary.close()
+            except Exception:
+                # أي فشل غير متوقع في الطريقة الأساسية يحسب محاولة فاشلة ولا يصل للواجهة
+                self.failures += 1
+                if self.failures >= self.max_failures:
+                    self.primary.supported = False
+                    self.primary.close()
+        return self.fallback.wait(department, division, since)
+
+    def send(self, payload):
+        return self.fallback.send(payload)
+
+    def close(self):
+        self.primary.close()
+        self.fallback.close()
+
+
+def create_chat_transport(api, mode="auto"):
+    """mode: polling أو long-poll أو sse أو auto (sse ثم long-poll ثم polling)"""
+    polling = PollingTransport(api)
+    if mode == "polling":
+        return polling
+    if mode == "long-poll":
+        return FallbackTransport(LongPollTransport(api), polling)
+    if mode == "sse":
+        return FallbackTransport(SseTransport(api), polling)
+    return FallbackTransport(
+        SseTransport(api),
+        FallbackTransport(LongPollTransport(api), polling),
+    )
@@ -1,5 +1,27 @@
+import logging
+
+from dates import parse_datetime
+
+logger = logging.getLogger("alson")
+
+
+def format_size(size):
+    for unit in ("بايت", "ك.ب", "م.ب"):
+        if size < 1024:
+            return f"{size:.0f} {unit}"
+        size /= 1024
+    return f"{size:.1f} ج.ب"
+
+
 class Content:
-    def __init__(self, id, title, file_path, file_type, uploaded_by, department, division, upload_date, description):
+    # بدون __dict__ لكل عنصر لتقليل حجم القوائم المخزنة في الذاكرة
+    __slots__ = (
+        "id", "title", "file_path", "file_type", "uploaded_by", "department", "division",
+        "upload_date", "description", "thumbnail", "file_size",
+    )
+
+    def __init__(self, id, title, file_path, file_type, uploaded_by, department, division, upload_date, description,
+                 thumbnail=None, file_size=None):
         self.id = id
         self.title = title
         self.file_path = file_path
@@ -9,9 +31,20 @@ class Content:
         self.division = division
         self.upload_date = upload_date
         self.description = description
+        # صورة مصغرة base64 يعيدها السيرفر إذا حفظها عند الرفع
+        self.thumbnail = thumbnail
+        self.file_size = file_size
+
+    @property
+    def formatted_size(self):
+        try:
+            return format_size(int(self.file_size))
+        except (TypeError, ValueError):
+            return "غير معروف"
 
     @classmethod
-    def from_json(cls, data):
+    def from_json(cls, data, parse_dates=False):
+        upload_date = data['upload_date']
         return cls(
             data['id'],
             data['title'],
@@ -20,6 +53,21 @@ class Content:
             data['uploaded_by'],
             data['department'],
             data['division'],
-            data['upload_date'],
-            data['description']
-        )
\ No newline at end of file
+            parse_datetime(upload_date) if parse_dates else upload_date,
+            data['description'],
+            data.get('thumbnail'),
+            data.get('file_size'),
+        )
+
+    @classmethod
+    def from_json_list(cls, items, parse_dates=False):
+        """تحويل قائمة كاملة في مرور واحد مع تجاهل السجلات الناقصة"""
+        result = []
+        append = result.append
+        from_json = cls.from_json
+        for data in items:
+            try:
+                append(from_json(data, parse_dates))
+            except (KeyError, TypeError, AttributeError):
+                logger.warning("تجاهل سجل محتوى غير صالح: %r", data)
+        return result
@@ -0,0 +1,19 @@
+from datetime import datetime
+
+# صيغة التواريخ التي يعيدها api.php
+SERVER_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def parse_datetime(value):
+    """تحويل نص التاريخ من السيرفر إلى datetime، مع إعادة القيمة كما هي إذا تعذر التحويل"""
+    if not isinstance(value, str):
+        return value
+    # fromisoformat أسرع بكثير من strptime وتقبل صيغة السيرفر "YYYY-MM-DD HH:MM:SS"
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(value, SERVER_FORMAT)
+    except ValueError:
+        return value
@@ -0,0 +1,88 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from storage import app_data_dir
+
+
+def conditional_headers(entry):
+    """ترويسات الطلب الشرطي لعنصر مخزن (قد يكون None)"""
+    headers = {}
+    if entry and entry["etag"]:
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry["last_modified"]:
+        headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+class ListingCache:
+    """تخزين دائم لاستجابات القوائم مع محددات التحقق (ETag / Last-Modified)"""
+
+    def __init__(self, path=None):
+        self._path = path
+        self._lock = threading.Lock()
+        # الملف يفتح عند أول استخدام حتى لا يدفع بدء التطبيق ثمن فتحه
+        self._conn = None
+        self._open_lock = threading.Lock()
+
+    @property
+    def path(self):
+        if self._path is None:
+            self._path = os.path.join(app_data_dir(), "http_cache.sqlite3")
+        return self._path
+
+    @property
+    def _db(self):
+        if self._conn is None:
+            with self._open_lock:
+                if self._conn is None:
+                    self._conn = self._connect()
+        return self._conn
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS listings ("
+            " key TEXT PRIMARY KEY,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " body TEXT NOT NULL,"
+            " stored_at REAL NOT NULL)"
+        )
+        db.commit()
+        return db
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, body FROM listings WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        return {"etag": row[0], "last_modified": row[1], "data": json.loads(row[2])}
+
+    def put(self, key, data, etag=None, last_modified=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO listings (key, etag, last_modified, body, stored_at) VALUES (?, ?, ?, ?, ?)",
+                (key, etag, last_modified, json.dumps(data, ensure_ascii=False), time.time()),
+            )
+            self._db.commit()
+
+    def touch(self, key):
+        with self._lock:
+            self._db.execute("UPDATE listings SET stored_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._db.execute("DELETE FROM listings WHERE key = ?", (key,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
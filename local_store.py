@@ -0,0 +1,296 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+from collections import Counter
+
+from content import Content
+from message import Message
+from storage import app_data_dir
+from user import User
+
+logger = logging.getLogger("alson")
+
+
+class LocalStore:
+    """نسخة محلية في SQLite من المحتوى والرسائل والمستخدمين تقرأ منها الشاشات دون انتظار الشبكة
+
+    كل سجل يحفظ كاملاً (JSON) مع أعمدة مفهرسة للقسم والشعبة والتاريخ، ويحدثه SyncEngine في الخلفية.
+    النسخة مشتركة بين الصفحات، فكل صفحة تفتح نطاق مستخدمها (القسم والشعبة) ولا يحذف إلا عند إغلاق آخر صفحة له.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        # عدد الصفحات المسجلة في كل نطاق، و "users" لصفحات المشرفين
+        self._scopes = Counter()
+        # الملف يفتح عند أول استخدام حتى لا يدفع بدء التطبيق ثمن فتحه
+        self._conn = None
+        self._open_lock = threading.Lock()
+
+    @property
+    def _db(self):
+        if self._conn is None:
+            with self._open_lock:
+                if self._conn is None:
+                    self._conn = self._connect()
+        return self._conn
+
+    def _connect(self):
+        db = sqlite3.connect(self.path or os.path.join(app_data_dir(), "store.sqlite3"), check_same_thread=False)
+        db.executescript(
+            "CREATE TABLE IF NOT EXISTS content ("
+            " id TEXT PRIMARY KEY, department TEXT, division TEXT, upload_date TEXT, body TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS content_scope ON content (department, division, upload_date);"
+            "CREATE TABLE IF NOT EXISTS messages ("
+            " id TEXT PRIMARY KEY, department TEXT, division TEXT, cursor INTEGER, body TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS messages_scope ON messages (department, division, cursor);"
+            "CREATE TABLE IF NOT EXISTS users ("
+            " code TEXT PRIMARY KEY, department TEXT, division TEXT, role TEXT, body TEXT NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS users_scope ON users (department, division);"
+            "CREATE TABLE IF NOT EXISTS sync_state (name TEXT PRIMARY KEY, cursor TEXT);"
+        )
+        db.commit()
+        return db
+
+    def _write(self, sql, rows):
+        with self._lock:
+            self._db.executemany(sql, rows)
+            self._db.commit()
+
+    def _read(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _body(item):
+        return json.dumps({slot: getattr(item, slot) for slot in item.__slots__}, ensure_ascii=False, default=str)
+
+    @staticmethod
+    def _scope(department, division):
+        """شرط القسم والشعبة؛ بدونهما (المشرف) يشمل كل المحتوى كما يعيده السيرفر"""
+        if department and division:
+            return " WHERE department = ? AND division = ?", (department, division)
+        return "", ()
+
+    # المحتوى
+    def put_content(self, items):
+        self._write(
+            "INSERT OR REPLACE INTO content (id, department, division, upload_date, body) VALUES (?, ?, ?, ?, ?)",
+            [(str(c.id), c.department, c.division, str(c.upload_date), self._body(c)) for c in items],
+        )
+
+    def delete_content(self, ids):
+        self._write("DELETE FROM content WHERE id = ?", [(str(id),) for id in ids])
+
+    def prune_content(self, department, division, keep, between=None):
+        """حذف محتوى القسم والشعبة الغائب عن صفحة أعادها السيرفر كاملة (محذوف على السيرفر)
+
+        between=(low, high) يقصر الحذف على ما بين أقدم وأحدث تاريخ في الصفحة، وبدونه تشمل الصفحة القائمة كلها.
+        """
+        where, params = self._scope(department, division)
+        sql = "SELECT id FROM content" + where
+        if between:
+            sql += (" AND" if where else " WHERE") + " upload_date > ? AND upload_date < ?"
+            params += tuple(between)
+        keep = {str(id) for id in keep}
+        self.delete_content([row[0] for row in self._read(sql, params) if row[0] not in keep])
+
+    def content(self, department, division):
+        """محتوى القسم والشعبة، الأحدث أولاً"""
+        where, params = self._scope(department, division)
+        rows = self._read(f"SELECT body FROM content{where} ORDER BY upload_date DESC, id DESC", params)
+        return Content.from_json_list(json.loads(row[0]) for row in rows)
+
+    # الرسائل
+    def put_messages(self, messages):
+        self._write(
+            "INSERT OR REPLACE INTO messages (id, department, division, cursor, body) VALUES (?, ?, ?, ?, ?)",
+            [(str(m.id), m.department, m.division, m.cursor, self._body(m)) for m in messages],
+        )
+
+    def messages(self, department, division, limit, before=None):
+        """أحدث limit رسالة (أو الأقدم من المؤشر before) بترتيب تصاعدي"""
+        rows = self._read(
+            "SELECT body FROM messages WHERE department = ? AND division = ? AND cursor < ?"
+            " ORDER BY cursor DESC LIMIT ?",
+            (department, division, before if before is not None else 2 ** 63 - 1, limit),
+        )
+        return Message.from_json_list(json.loads(row[0]) for row in reversed(rows))
+
+    def last_message_cursor(self, department, division):
+        rows = self._read("SELECT MAX(cursor) FROM messages WHERE department = ? AND division = ?", (department, division))
+        return rows[0][0] or 0
+
+    # المستخدمون
+    def put_users(self, users):
+        self._write(
+            "INSERT OR REPLACE INTO users (code, department, division, role, body) VALUES (?, ?, ?, ?, ?)",
+            [(u.code, u.department, u.division, u.role, self._body(u)) for u in users],
+        )
+
+    def delete_users(self, codes):
+        self._write("DELETE FROM users WHERE code = ?", [(code,) for code in codes])
+
+    def prune_users(self, keep):
+        """حذف المستخدمين الغائبين عن الدليل الكامل الذي أعاده السيرفر"""
+        keep = set(keep)
+        self.delete_users([row[0] for row in self._read("SELECT code FROM users") if row[0] not in keep])
+
+    def users(self):
+        rows = self._read("SELECT body FROM users ORDER BY code")
+        return User.from_json_list(json.loads(row[0]) for row in rows)
+
+    # مؤشرات المزامنة
+    def cursor(self, name):
+        rows = self._read("SELECT cursor FROM sync_state WHERE name = ?", (name,))
+        return rows[0][0] if rows else None
+
+    def set_cursor(self, name, cursor):
+        self._write("INSERT OR REPLACE INTO sync_state (name, cursor) VALUES (?, ?)", [(name, cursor)])
+
+    @staticmethod
+    def scope_name(department, division):
+        return f"{department or ''}-{division or ''}"
+
+    def open_scope(self, department, division, users=False):
+        with self._lock:
+            self._scopes[self.scope_name(department, division)] += 1
+            if users:
+                self._scopes["users"] += 1
+
+    def close_scope(self, department, division, users=False):
+        """خروج صفحة من نطاقها، مع حذف بياناته ومؤشراته إن لم تعد صفحة أخرى تستخدمه"""
+        scope = self.scope_name(department, division)
+        with self._lock:
+            for name in (scope, "users") if users else (scope,):
+                if self._scopes[name] > 0:
+                    self._scopes[name] -= 1
+            open_scopes = {name for name, count in self._scopes.items() if count > 0}
+            if users and "users" not in open_scopes:
+                self._db.execute("DELETE FROM users")
+            if scope not in open_scopes:
+                self._clear_scope(department or "", division or "", open_scopes)
+            self._db.commit()
+
+    def _clear_scope(self, department, division, open_scopes):
+        self._db.execute("DELETE FROM messages WHERE department = ? AND division = ?", (department, division))
+        suffix = "@" + self.scope_name(department, division)
+        self._db.executemany(
+            "DELETE FROM sync_state WHERE name = ?",
+            [row for row in self._db.execute("SELECT name FROM sync_state") if row[0].endswith(suffix)],
+        )
+        if department and division:
+            # محتوى المشرف (بدون قسم) يشمل كل الأقسام، فلا يحذف ما دامت صفحته مفتوحة
+            if "-" not in open_scopes:
+                self._db.execute("DELETE FROM content WHERE department = ? AND division = ?", (department, division))
+            return
+        stale = [
+            row for row in self._db.execute("SELECT DISTINCT department, division FROM content")
+            if self.scope_name(*row) not in open_scopes
+        ]
+        self._db.executemany("DELETE FROM content WHERE department = ? AND division = ?", stale)
+
+
+class SyncBatch:
+    """التغييرات التي أعادها السيرفر لمجموعة واحدة
+
+    delta=False تعني أن السيرفر تجاهل updated_since وأعاد صفحة عادية من القائمة (تضاف دون حذف).
+    """
+
+    def __init__(self, items, deleted=(), cursor=None, delta=True):
+        self.items = items
+        self.deleted = list(deleted)
+        self.cursor = cursor
+        self.delta = delta
+
+    @property
+    def changed(self):
+        # صفحة كاملة (delta=False) تصل فقط إذا تغيرت، حتى لو كانت فارغة بعد حذف كل العناصر
+        return bool(self.items or self.deleted) or not self.delta
+
+    @classmethod
+    def from_response(cls, data, since, cursor_of):
+        """{"items", "deleted", "cursor"} من سيرفر يدعم updated_since، أو قائمة عادية من سيرفر لا يدعمه"""
+        if isinstance(data, dict):
+            items = data.get("items") or []
+            cursor = data.get("cursor") or max((cursor_of(item) for item in items), default=since)
+            return cls(items, data.get("deleted") or (), cursor)
+        return cls(data, (), since, delta=False)
+
+
+class SyncEngine:
+    """مزامنة الجداول المحلية مع السيرفر في خيط واحد في الخلفية، بمؤشر updated_since لكل مجموعة
+
+    pull(cursor) تعيد SyncBatch أو None عند الفشل، و apply(batch) تكتبه في LocalStore (عند وجود تغيير فقط).
+    on_change(name) تستدعى بعد كل مجموعة تغيرت حتى تعيد الشاشة المفتوحة قراءة بياناتها.
+    مؤشر كل مجموعة يحفظ باسمها ونطاق المستخدم (name@scope) حتى لا تتداخل صفحات أقسام مختلفة.
+    delta_only=True يوقف مزامنة المجموعة إذا لم يدعم السيرفر updated_since بدلاً من تكرار تنزيلها.
+    """
+
+    def __init__(self, store, interval=60, on_change=None):
+        self.store = store
+        self.interval = interval
+        self.on_change = on_change
+        self._sources = {}
+        self._delta_only = set()
+        self._wake = threading.Event()
+        self._stop = None
+        self.scope = ""
+
+    def add(self, name, pull, apply, delta_only=False):
+        self._sources[name] = (pull, apply)
+        if delta_only:
+            self._delta_only.add(name)
+
+    def sync(self, name):
+        pull, apply = self._sources[name]
+        cursor_name = f"{name}@{self.scope}"
+        since = self.store.cursor(cursor_name)
+        batch = pull(since)
+        if batch is None:
+            return False
+        if not batch.delta and name in self._delta_only:
+            logger.info("server ignores updated_since, %s sync disabled", name)
+            self._sources.pop(name, None)
+        if batch.changed:
+            apply(batch)
+        if batch.cursor is not None and str(batch.cursor) != since:
+            self.store.set_cursor(cursor_name, str(batch.cursor))
+        if batch.changed and self.on_change:
+            self.on_change(name)
+        return True
+
+    def _run(self, stop):
+        while not stop.is_set():
+            # أول مزامنة بعد مهلة لأن البيانات حملت للتو عند الدخول؛ sync_now يقطع الانتظار
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            for name in list(self._sources):
+                if stop.is_set():
+                    break
+                try:
+                    self.sync(name)
+                except Exception as e:
+                    logger.warning("sync %s failed: %s", name, e)
+
+    def start(self, scope=""):
+        self.scope = scope
+        if self._stop is not None and not self._stop.is_set():
+            return self
+        # حدث إيقاف لكل خيط حتى لا يستمر الخيط القديم بعد تسجيل دخول جديد
+        self._stop = threading.Event()
+        threading.Thread(target=self._run, args=(self._stop,), name="store-sync", daemon=True).start()
+        return self
+
+    def sync_now(self):
+        self._wake.set()
+
+    def stop(self):
+        """إيقاف المزامنة وإزالة المجموعات (تضاف من جديد للمستخدم التالي)"""
+        if self._stop is not None:
+            self._stop.set()
+        self._wake.set()
+        self._sources.clear()
+        self._delta_only.clear()
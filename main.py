@@ -1,29 +1,108 @@
+import time
+# بداية التشغيل لقياس زمن ظهور أول شاشة
+STARTED_AT = time.perf_counter()
+
 import flet as ft
-import requests
 import json
+from api_client import ApiClient
+from auth import TokenAuth, TokenStore, ClientStorageTokenStore
+from chat_transport import create_chat_transport, TransportError
+from http_cache import ListingCache, conditional_headers
+from cache import LRUCache
+from workers import TaskRunner, TaskGroup
+from virtual_list import VirtualList
+from pagination import Pager
+from uploader import ChunkedUploader, UploadError, UploadUnsupported, UploadJob, UploadQueue
+from bulk_users import BulkUsers
+from preprocess import prepare_upload, PreparedUpload, make_thumbnail, IMAGE_TYPES
+from blob_cache import BlobCache, FetchCancelled
+from paged_text import PagedText
+from thumbnails import ThumbnailLoader
 from user import User
-from content import Content
+from content import Content, format_size
 from message import Message
-import webbrowser
 import os
+import base64
+import tempfile
+from pathlib import Path
 from datetime import datetime
 from functools import partial
 import threading
-import time
-import locale
+import logging
+import hashlib
+from scheduler import PollerScheduler, Debouncer
+from outbox import ChatOutbox, PermanentSendError
+from search_index import SearchIndex
+from local_store import LocalStore, SyncBatch, SyncEngine
+from storage import app_data_dir
+
+logger = logging.getLogger("alson")
+
+
+def configure_logging():
+    """عرض سجلات التطبيق (ومنها أزمنة بدء التشغيل والتحميل المسبق) في الطرفية؛ المستوى من ALSON_LOG_LEVEL"""
+    if logger.handlers:
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(os.environ.get("ALSON_LOG_LEVEL", "INFO").upper())
+
+
+def set_arabic_locale():
+    # تعيين اللغة العربية (يؤجل لما بعد ظهور أول شاشة)
+    import locale
 
-# تعيين اللغة العربية
-try:
-    locale.setlocale(locale.LC_ALL, 'ar_AE.UTF-8')
-except:
     try:
-        locale.setlocale(locale.LC_ALL, 'Arabic')
+        locale.setlocale(locale.LC_ALL, 'ar_AE.UTF-8')
     except:
-        pass
+        try:
+            locale.setlocale(locale.LC_ALL, 'Arabic')
+        except:
+            pass
+
+
+def open_local_file(path):
+    import webbrowser
+
+    webbrowser.open(Path(path).as_uri())
 
-API_URL = "https://ki74.alalsunacademy.com/api"
+
+API_URL = os.environ.get("ALSON_API_URL", "https://ki74.alalsunacademy.com/api")
+# عدد العناصر في كل صفحة تحمل من السيرفر
+CONTENT_PAGE_SIZE = 100
+CHAT_PAGE_SIZE = 50
+USERS_PAGE_SIZE = 500
+# طريقة نقل الشات: auto أو sse أو long-poll أو polling
+CHAT_TRANSPORT = os.environ.get("ALSON_CHAT_TRANSPORT", "auto")
+
+# اتصالات HTTP مشتركة لكل الصفحات (اتصالات دائمة بدلاً من مصافحة TLS جديدة في كل طلب)،
+# وكل صفحة تأخذ منها عميلاً برمز جلستها الخاص
+shared_api = ApiClient(API_URL)
+# تخزين دائم لقوائم المحتوى بين مرات التشغيل مع التحقق الشرطي من السيرفر
+listing_cache = ListingCache()
+# الملفات المعروضة تحفظ محلياً لفتحها مرة أخرى دون تحميل أو بدون إنترنت
+FILES_URL = "https://ki74.alalsunacademy.com/"
+blob_cache = BlobCache()
+# نسخة محلية من المحتوى والرسائل والمستخدمين تعرضها الشاشات فوراً وتحدثها المزامنة في الخلفية
+store = LocalStore()
+SYNC_INTERVAL = 60
+
+# خط Cairo (ملف واحد بكل الأوزان) يضمن مع التطبيق في assets/fonts إن وجد، وإلا يحمل مرة واحدة ويحفظ في مجلد بيانات التطبيق
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+FONT_FILE = "fonts/Cairo.ttf"
+FONT_URL = "https://raw.githubusercontent.com/google/fonts/main/ofl/cairo/Cairo%5Bslnt%2Cwght%5D.ttf"
 
 def main(page: ft.Page):
+    # رمز الجلسة يحفظ محلياً ويضاف لكل طلب بدلاً من إعادة إرسال كلمة المرور، وهو خاص بهذه الصفحة
+    api = shared_api.with_auth()
+    auth = TokenAuth(api, store=ClientStorageTokenStore(page.client_storage) if page.web else TokenStore())
+    api.auth = auth
+    # رفع الملفات على أجزاء مع الاستئناف بعد الانقطاع
+    uploader = ChunkedUploader(api)
+    # إضافة وحذف المستخدمين على دفعات (استيراد CSV والحذف المتعدد)
+    bulk_users = BulkUsers(api)
+
     # إعدادات التصميم الحديث
     page.title = "أكاديمية الألسن"
     page.theme_mode = ft.ThemeMode.LIGHT
@@ -32,10 +111,6 @@ def main(page: ft.Page):
     page.window_min_height = 640
     page.padding = 0
     page.rtl = True  # تمكين الدعم الكامل للغة العربية
-    page.fonts = {
-        "Cairo": "https://fonts.googleapis.com/css2?family=Cairo&display=swap",
-        "Cairo-Bold": "https://fonts.googleapis.com/css2?family=Cairo:wght@700&display=swap"
-    }
     page.theme = ft.Theme(
         font_family="Cairo",
         color_scheme=ft.ColorScheme(
@@ -66,7 +141,6 @@ def main(page: ft.Page):
     )
     
     page.bgcolor = page.theme.color_scheme.background
-    page.client_storage.clear()
 
     # إعدادات الشريط الجانبي
     nav_rail_visible = True
@@ -77,14 +151,67 @@ def main(page: ft.Page):
     page.overlay.append(loading_indicator)
 
     # متغيرات التخزين المؤقت
-    content_cache = {}
-    messages_cache = {}
+    # المحتوى صالح 5 دقائق والرسائل 15 ثانية والمستخدمين دقيقتين، مع حد أقصى للعناصر والحجم (8 ميجابايت)
+    cache = LRUCache(
+        max_entries=64,
+        max_bytes=8 * 1024 * 1024,
+        ttls={"content": 300, "messages": 15, "users": 120},
+    )
+    content_cache = cache.namespace("content")
+    messages_cache = cache.namespace("messages")
+    users_cache = cache.namespace("users")
+    # الصور المصغرة في ذاكرة منفصلة محدودة الحجم حتى لا تخرج القوائم من التخزين المؤقت
+    thumbnail_cache = LRUCache(max_entries=300, max_bytes=2 * 1024 * 1024).namespace("thumbnails")
+
+    # مهام التحديث الدوري الخاصة بهذه الجلسة (مهمة واحدة لكل شاشة)
+    pollers = PollerScheduler()
+    chat_transport = create_chat_transport(api, CHAT_TRANSPORT)
+
+    # الشاشة المفتوحة تسجل هنا دالة تعيد قراءة بياناتها من النسخة المحلية عند تغيرها
+    store_listeners = {}
+
+    def on_store_change(name):
+        listener = store_listeners.get(name)
+        if listener:
+            listener()
+
+    def watch_store(name, listener):
+        # مستمع واحد للشاشة الحالية فقط
+        store_listeners.clear()
+        store_listeners[name] = listener
+
+    sync = SyncEngine(store, interval=SYNC_INTERVAL, on_change=on_store_change)
+    # نطاق المستخدم الحالي في النسخة المحلية (القسم، الشعبة، مشرف) لإغلاقه عند الخروج
+    store_scope = None
+
+    # طلبات الشبكة تعمل في الخلفية حتى لا تتجمد الواجهة
+    tasks = TaskRunner(max_workers=8)
+    # خيوط منفصلة للصور المصغرة حتى لا تؤخر طلبات الشاشة
+    thumbnail_tasks = TaskRunner(max_workers=3)
+    thumbnails = None
+    # إيقاف التحميل المستمر الخاص بالشاشة الحالية (نص طويل أو دليل المستخدمين) عند مغادرتها
+    view_cancel = threading.Event()
+    warmup = None
+    loading_count = 0
+    loading_lock = threading.Lock()
 
     # وظائف مساعدة
     def show_loading(visible):
-        loading_indicator.visible = visible
+        # عداد لأن عدة طلبات قد تعمل في نفس الوقت
+        nonlocal loading_count
+        with loading_lock:
+            loading_count = loading_count + 1 if visible else max(loading_count - 1, 0)
+            loading_indicator.visible = loading_count > 0
         page.update()
 
+    def run_in_background(func, *args, on_done=None, **kwargs):
+        return tasks.submit(
+            func, *args,
+            on_done=on_done,
+            on_error=lambda e: show_error(f"خطأ غير متوقع: {e}"),
+            **kwargs,
+        )
+
     def show_error(message):
         page.snack_bar = ft.SnackBar(
             content=ft.Text(message, text_align=ft.TextAlign.CENTER, color=ft.Colors.WHITE),
@@ -134,17 +261,13 @@ def main(page: ft.Page):
         
         show_loading(True)
         try:
-            response = requests.post(
-                f"{API_URL}/api.php?table=users&action=login",
-                json={"code": code, "password": password},
-                headers={"Content-Type": "application/json"},
-                timeout=10,
-            )
+            response = auth.login(code, password)
             if response.status_code == 200:
                 try:
                     user_data = response.json()
-                    page.client_storage.set("user", json.dumps(user_data))
                     page.user = User.from_json(user_data)
+                    # حفظ بيانات المستخدم فقط (بدون أي حقول أخرى من الاستجابة) لاستعادة الجلسة عند التشغيل التالي
+                    page.client_storage.set("user", json.dumps(page.user.to_json()))
                     return page.user
                 except json.JSONDecodeError:
                     show_error("خطأ في استجابة السيرفر: تنسيق غير صالح")
@@ -162,81 +285,177 @@ def main(page: ft.Page):
         finally:
             show_loading(False)
 
-    def get_content(department, division):
+    def patch_cached_list(namespace, cache_key, key, remove=(), add=()):
+        """تطبيق تعديل المشرف على القائمة المخزنة مؤقتاً بدلاً من حذفها وإعادة تحميلها"""
+        cached = namespace.get(cache_key)
+        if cached is None:
+            return
+        remove = set(remove) | {key(item) for item in add}
+        namespace[cache_key] = [item for item in cached if key(item) not in remove] + list(add)
+
+    def get_content(department, division, force=False):
+        """أول صفحة من المحتوى (الصفحات التالية عبر get_content_page)
+
+        force=True يتجاوز النسخة المخزنة في الذاكرة (للتأكد من التعديلات المحلية).
+        """
         cache_key = f"{department}-{division}"
-        if cache_key in content_cache:
-            return content_cache[cache_key]
+        cached = content_cache.get(cache_key)
+        if cached is not None and not force:
+            return cached
         
+        stored = listing_cache.get(f"content:{cache_key}")
         show_loading(True)
         try:
-            url = f"{API_URL}/api.php?table=content"
+            url = "api.php?table=content"
             if department and division:
                 url += f"&department={department}&division={division}"
-            response = requests.get(url, headers={"Content-Type": "application/json"}, timeout=10)
-            if response.status_code == 200:
-                content_list = [Content.from_json(item) for item in response.json()]
-                content_cache[cache_key] = content_list
-                return content_list
+            url += f"&limit={CONTENT_PAGE_SIZE}&offset=0"
+            headers = {"Content-Type": "application/json", **conditional_headers(stored)}
+            response = api.get(url, endpoint="content", headers=headers)
+            if response.status_code == 304 and stored:
+                # لم يتغير المحتوى: نستخدم النسخة المخزنة على الجهاز
+                items = stored["data"]
+                listing_cache.touch(f"content:{cache_key}")
+            elif response.status_code == 200:
+                items = response.json()
+                listing_cache.put(
+                    f"content:{cache_key}",
+                    items,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                )
             else:
                 show_error("فشل في جلب المحتوى")
                 return []
+            content_list = Content.from_json_list(items)
+            content_cache[cache_key] = content_list
+            store.put_content(content_list)
+            return content_list
         except Exception as e:
             show_error("فشل في الاتصال بالسيرفر")
+            if stored:
+                # بدون اتصال: عرض آخر نسخة مخزنة
+                return Content.from_json_list(stored["data"])
             return []
         finally:
             show_loading(False)
 
-    @require_admin
-    def upload_content(title, file_path, uploaded_by, department, division, description):
+    def get_content_page(department, division, offset, limit):
+        """صفحة تالية من المحتوى، أو None عند الفشل"""
         show_loading(True)
         try:
-            with open(file_path, "rb") as file:
+            url = "api.php?table=content"
+            if department and division:
+                url += f"&department={department}&division={division}"
+            url += f"&limit={limit}&offset={offset}"
+            response = api.get(url, endpoint="content", headers={"Content-Type": "application/json"})
+            if response.status_code == 200:
+                items = Content.from_json_list(response.json())
+                store.put_content(items)
+                return items
+            show_error("فشل في جلب المحتوى")
+            return None
+        except Exception as e:
+            show_error("فشل في الاتصال بالسيرفر")
+            return None
+        finally:
+            show_loading(False)
+
+    @require_admin
+    def upload_file(title, file_path, uploaded_by, department, division, description, progress=None, optimize=True):
+        """رفع ملف واحد دون رسائل للواجهة، ويرمي UploadError عند الفشل
+
+        optimize=True يصغر الصور ويضغط النصوص قبل الرفع. تعيد الملف المجهز (للحجم الموفر).
+        """
+        data = {
+            "title": title,
+            "uploaded_by": uploaded_by,
+            "department": department,
+            "division": division,
+            "description": description,
+        }
+        prepared = prepare_upload(file_path) if optimize else PreparedUpload(file_path, file_path)
+        try:
+            uploader.upload(prepared.path, {**data, **prepared.fields}, progress=progress)
+        except UploadUnsupported:
+            # السيرفر لا يدعم الرفع المجزأ: رفع الملف في طلب واحد
+            with open(prepared.legacy_path, "rb") as file:
                 files = {"file": (os.path.basename(file_path), file, "application/octet-stream")}
-                data = {
-                    "title": title,
-                    "uploaded_by": uploaded_by,
-                    "department": department,
-                    "division": division,
-                    "description": description,
-                }
-                response = requests.post(
-                    f"{API_URL}/upload.php",
-                    data=data,
+                response = api.post(
+                    "upload.php",
+                    endpoint="upload",
+                    data={**data, **{k: v for k, v in prepared.fields.items() if k != "content_encoding"}},
                     files=files,
-                    timeout=30,  # زيادة المهلة للرفع
                 )
-                if response.status_code == 200:
-                    show_success("تم رفع المحتوى بنجاح")
-                    # مسح المحتوى المخزن مؤقتاً
-                    cache_key = f"{department}-{division}"
-                    if cache_key in content_cache:
-                        del content_cache[cache_key]
-                    return True
-                else:
-                    show_error(f"فشل في رفع المحتوى: {response.text}")
-                    return False
+            if response.status_code != 200:
+                raise UploadError(response.text)
+            prepared.size = os.path.getsize(prepared.legacy_path)
+            if progress:
+                progress(1.0)
+        prepared.cleanup()
+        return prepared
+
+    @require_admin
+    def upload_content(title, file_path, uploaded_by, department, division, description, progress=None, optimize=True):
+        """progress(نسبة من 0 إلى 1) تستدعى أثناء الرفع المجزأ"""
+        show_loading(True)
+        try:
+            prepared = upload_file(title, file_path, uploaded_by, department, division, description, progress, optimize)
+            if prepared.saved_bytes:
+                show_success(f"تم رفع المحتوى بنجاح (توفير {format_size(prepared.saved_bytes)} - {prepared.saved_ratio:.0%})")
+            else:
+                show_success("تم رفع المحتوى بنجاح")
+            # مسح المحتوى المخزن مؤقتاً
+            cache_key = f"{department}-{division}"
+            content_cache.pop(cache_key)
+            return True
         except Exception as e:
             show_error(f"فشل في رفع المحتوى: {e}")
             return False
         finally:
             show_loading(False)
 
+    @require_admin
+    def upload_many(file_paths, uploaded_by, department, division, description, on_update=None, optimize=True):
+        """رفع عدة ملفات بالتوازي (3 في نفس الوقت) مع استنتاج العنوان والنوع من اسم كل ملف"""
+        jobs = [UploadJob.from_path(path) for path in file_paths]
+        saved = []
+
+        def upload_job(job, progress):
+            prepared = upload_file(job.title, job.path, uploaded_by, department, division, description, progress, optimize)
+            saved.append(prepared.saved_bytes)
+
+        queue = UploadQueue(upload_job, max_concurrent=3)
+        show_loading(True)
+        try:
+            queue.run(jobs, on_update)
+        finally:
+            # مسح المحتوى المخزن مؤقتاً مرة واحدة بعد انتهاء كل الملفات
+            content_cache.pop(f"{department}-{division}")
+            show_loading(False)
+        failed = [job for job in jobs if job.status == UploadJob.FAILED]
+        if failed:
+            show_error(f"فشل رفع {len(failed)} من {len(jobs)} ملف")
+        elif sum(saved):
+            show_success(f"تم رفع {len(jobs)} ملف بنجاح (توفير {format_size(sum(saved))})")
+        else:
+            show_success(f"تم رفع {len(jobs)} ملف بنجاح")
+        return jobs
+
     @require_admin
     def delete_content(id, department, division):
         show_loading(True)
         try:
-            response = requests.delete(
-                f"{API_URL}/api.php?table=content",
+            response = api.delete(
+                "api.php?table=content",
+                endpoint="content",
                 json={"id": id},
                 headers={"Content-Type": "application/json"},
-                timeout=10,
             )
             if response.status_code == 200:
                 show_success("تم حذف المحتوى بنجاح")
-                # مسح المحتوى المخزن مؤقتاً
-                cache_key = f"{department}-{division}"
-                if cache_key in content_cache:
-                    del content_cache[cache_key]
+                patch_cached_list(content_cache, f"{department}-{division}", lambda item: item.id, remove=[id])
+                store.delete_content([id])
                 return True
             else:
                 show_error(f"فشل في حذف المحتوى: {response.text}")
@@ -247,80 +466,187 @@ def main(page: ft.Page):
         finally:
             show_loading(False)
 
-    def get_chat_messages(department, division):
+    def get_thumbnail(item, cancel):
+        """صورة مصغرة base64: من السيرفر إن وجدت، وإلا تولد من الصورة الأصلية وتحفظ المصغرة فقط"""
+        if item.thumbnail:
+            return item.thumbnail
+        thumbnail_key = BlobCache.key_for(item.id, f"{item.file_path}#thumbnail")
+        path = blob_cache.path(thumbnail_key)
+        if not path:
+            # الأصل يقرأ في ملف مؤقت ولا يحفظ، فتمرير القائمة لا يملأ مخزن الملفات التي فتحها المستخدم
+            with tempfile.TemporaryFile() as source:
+                blob_cache.copy_to(
+                    BlobCache.key_for(item.id, item.file_path),
+                    FILES_URL + item.file_path,
+                    api,
+                    source,
+                    cancel=cancel,
+                )
+                source.seek(0)
+                data = make_thumbnail(source)
+            if data is None:
+                return None
+            path = blob_cache.put(thumbnail_key, [data], ".jpg")
+        with open(path, "rb") as f:
+            return base64.b64encode(f.read()).decode("ascii")
+
+    def get_local_file(item):
+        """المسار المحلي لملف المحتوى، مع تحميله مرة واحدة فقط"""
+        key = BlobCache.key_for(item.id, item.file_path)
+        path = blob_cache.path(key)
+        if path:
+            return path
+        show_loading(True)
+        try:
+            return blob_cache.fetch(key, FILES_URL + item.file_path, api, suffix=f".{item.file_type}")
+        except Exception as e:
+            show_error("فشل في تحميل الملف، وهو غير محفوظ على الجهاز")
+            return None
+        finally:
+            show_loading(False)
+
+    def get_chat_messages(department, division, since=None, wait=False):
+        """جلب الرسائل، أو الرسائل الأحدث من المؤشر since فقط عند تمريره
+
+        wait=True يترك لطريقة النقل (SSE/الاستطلاع الطويل) انتظار وصول رسائل جديدة.
+        """
         cache_key = f"{department}-{division}"
-        if cache_key in messages_cache:
-            return messages_cache[cache_key]
+        cached = messages_cache.get(cache_key) if since is None else None
+        if cached is not None:
+            return cached
         
         try:
-            url = f"{API_URL}/api.php?table=messages"
-            if department and division:
-                url += f"&department={department}&division={division}"
-            response = requests.get(url, headers={"Content-Type": "application/json"}, timeout=10)
-            if response.status_code == 200:
-                messages = [Message.from_json(item) for item in response.json()]
-                messages_cache[cache_key] = messages
-                return messages
+            if wait:
+                items = chat_transport.wait(department, division, since)
+            elif since is None:
+                # أحدث صفحة فقط، والرسائل الأقدم تحمل عند التمرير لأعلى
+                items = chat_transport.fetch(department, division, limit=CHAT_PAGE_SIZE)
             else:
-                show_error("فشل في جلب الرسائل")
-                return []
+                items = chat_transport.fetch(department, division, since)
+            messages = Message.from_json_list(items)
+            if since is not None:
+                # ترشيح محلي في حال تجاهل السيرفر للمعامل since
+                messages = [m for m in messages if m.cursor > since]
+                cached = messages_cache.get(cache_key)
+                if cached is not None:
+                    messages_cache[cache_key] = cached + messages
+            else:
+                messages_cache[cache_key] = messages
+            store.put_messages(messages)
+            return messages
+        except TransportError:
+            show_error("فشل في جلب الرسائل")
+            return []
         except Exception as e:
             show_error("فشل في الاتصال بالسيرفر")
             return []
 
-    def send_message(sender_id, department, division, content):
+    def stop_chat_updates():
+        # إغلاق الاتصال (SSE/الاستطلاع الطويل) ينهي انتظار خيط الشات السابق فوراً بدلاً من بقائه معلقاً
+        pollers.stop("chat")
+        chat_transport.close()
+
+    def get_older_messages(department, division, before, limit):
+        """صفحة من الرسائل الأقدم من المؤشر before، أو None عند الفشل"""
+        # السجل المحفوظ محلياً يعرض دون طلب إذا كانت الصفحة كاملة
+        stored = store.messages(department, division, limit, before=before)
+        if len(stored) == limit:
+            return stored
         try:
-            id = str(int(datetime.now().timestamp() * 1000))
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            response = requests.post(
-                f"{API_URL}/api.php?table=messages",
-                json={
-                    "id": id,
-                    "content": content,
-                    "sender_id": sender_id,
-                    "department": department,
-                    "division": division,
-                    "timestamp": timestamp,
-                },
-                headers={"Content-Type": "application/json"},
-                timeout=10,
-            )
-            if response.status_code == 200:
-                # مسح الرسائل المخزنة مؤقتاً
-                cache_key = f"{department}-{division}"
-                if cache_key in messages_cache:
-                    del messages_cache[cache_key]
-                return True
-            else:
-                show_error(f"فشل في إرسال الرسالة: {response.text}")
-                return False
+            items = chat_transport.fetch(department, division, before=before, limit=limit)
+            # ترشيح محلي في حال تجاهل السيرفر للمعامل before
+            older = [m for m in Message.from_json_list(items) if m.cursor < before]
+            store.put_messages(older)
+            return older
+        except TransportError:
+            show_error("فشل في جلب الرسائل")
+            return None
         except Exception as e:
-            show_error("فشل في إرسال الرسالة")
-            return False
+            show_error("فشل في الاتصال بالسيرفر")
+            return None
+
+    def send_message(sender_id, department, division, content):
+        """حفظ الرسالة في صندوق الصادر وإعادتها فوراً؛ الإرسال الفعلي يتم في الخلفية بالترتيب"""
+        nonlocal last_message_id
+        now = datetime.now()
+        # المعرف بالملي ثانية ويجب ألا يتكرر حتى مع رسالتين في نفس اللحظة
+        last_message_id = max(int(now.timestamp() * 1000), last_message_id + 1)
+        return outbox.add({
+            "id": str(last_message_id),
+            "content": content,
+            "sender_id": sender_id,
+            "department": department,
+            "division": division,
+            "timestamp": now.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+
+    def deliver_message(payload):
+        try:
+            chat_transport.send(payload)
+        except TransportError as e:
+            status = e.response.status_code
+            # أخطاء الطلب نفسه لا تحل بإعادة المحاولة
+            if 400 <= status < 500 and status not in (401, 408, 429):
+                raise PermanentSendError(e.response.text)
+            raise
+
+    def on_message_sent(payload):
+        messages_cache.pop(f"{payload['department']}-{payload['division']}")
+        status = outbox_bubbles.pop(payload["id"], None)
+        if status is not None:
+            status.value = payload["timestamp"]
+            page.update()
+
+    def on_message_failed(payload, error):
+        status = outbox_bubbles.pop(payload["id"], None)
+        if status is not None:
+            status.value = "لم ترسل الرسالة"
+            status.color = ft.Colors.RED
+        show_error(f"فشل في إرسال الرسالة: {error}")
+
+    # رسائل الشات تحفظ على القرص قبل إرسالها حتى لا تضيع عند انقطاع الشبكة
+    last_message_id = 0
+    outbox_bubbles = {}
+    outbox = ChatOutbox(deliver_message, on_sent=on_message_sent, on_failed=on_message_failed)
 
     @require_admin
     def get_users():
+        """أول صفحة من المستخدمين (الصفحات التالية عبر get_users_page)"""
+        cached = users_cache.get("all")
+        if cached is not None:
+            return cached
+        users = get_users_page(0, USERS_PAGE_SIZE)
+        if users is None:
+            return []
+        users_cache["all"] = users
+        return users
+
+    @require_admin
+    def get_users_page(offset, limit):
+        """صفحة من المستخدمين، أو None عند الفشل"""
         try:
-            response = requests.get(
-                f"{API_URL}/api.php?table=users&action=all",
+            response = api.get(
+                f"api.php?table=users&action=all&limit={limit}&offset={offset}",
+                endpoint="users",
                 headers={"Content-Type": "application/json"},
-                timeout=10,
             )
             if response.status_code == 200:
-                return [User.from_json(item) for item in response.json()]
-            else:
-                show_error("فشل في جلب المستخدمين")
-                return []
+                users = User.from_json_list(response.json())
+                store.put_users(users)
+                return users
+            show_error("فشل في جلب المستخدمين")
+            return None
         except Exception as e:
             show_error("فشل في الاتصال بالسيرفر")
-            return []
+            return None
 
     @require_admin
     def add_user(code, username, department, division, role, password):
         show_loading(True)
         try:
-            response = requests.post(
-                f"{API_URL}/api.php?table=users&action=add",
+            response = api.post(
+                "api.php?table=users&action=add",
+                endpoint="users",
                 json={
                     "code": code,
                     "username": username,
@@ -330,17 +656,23 @@ def main(page: ft.Page):
                     "password": password,
                 },
                 headers={"Content-Type": "application/json"},
-                timeout=10,
             )
             if response.status_code == 200:
                 show_success("تم إضافة المستخدم بنجاح")
-                return True
+                # السيرفر يعيد المستخدم المضاف؛ السيرفرات القديمة لا تعيده فنبنيه من الحقول
+                try:
+                    user = User.from_json(response.json())
+                except (ValueError, KeyError, TypeError):
+                    user = User(code, username, department, division, role)
+                patch_cached_list(users_cache, "all", lambda u: u.code, add=[user])
+                store.put_users([user])
+                return user
             else:
                 show_error(f"فشل في إضافة المستخدم: {response.text}")
-                return False
+                return None
         except Exception as e:
             show_error("فشل في إضافة المستخدم")
-            return False
+            return None
         finally:
             show_loading(False)
 
@@ -348,14 +680,16 @@ def main(page: ft.Page):
     def delete_user(code):
         show_loading(True)
         try:
-            response = requests.delete(
-                f"{API_URL}/api.php?table=users",
+            response = api.delete(
+                "api.php?table=users",
+                endpoint="users",
                 json={"code": code},
                 headers={"Content-Type": "application/json"},
-                timeout=10,
             )
             if response.status_code == 200:
                 show_success("تم حذف المستخدم بنجاح")
+                patch_cached_list(users_cache, "all", lambda u: u.code, remove=[code])
+                store.delete_users([code])
                 return True
             else:
                 show_error(f"فشل في حذف المستخدم: {response.text}")
@@ -366,6 +700,38 @@ def main(page: ft.Page):
         finally:
             show_loading(False)
 
+    @require_admin
+    def import_users(path, existing_codes=(), progress=None):
+        show_loading(True)
+        try:
+            result = bulk_users.import_csv(path, existing_codes, progress)
+            users_cache.pop("all")
+            if result.errors:
+                show_error(f"تم إضافة {len(result.succeeded)} مستخدم، وفشل {len(result.errors)} سطر")
+            else:
+                show_success(f"تم إضافة {len(result.succeeded)} مستخدم بنجاح")
+            return result
+        except (OSError, UnicodeDecodeError) as e:
+            show_error(f"تعذرت قراءة الملف: {e}")
+            return None
+        finally:
+            show_loading(False)
+
+    @require_admin
+    def delete_users(codes):
+        show_loading(True)
+        try:
+            result = bulk_users.delete(codes)
+            patch_cached_list(users_cache, "all", lambda u: u.code, remove=result.succeeded)
+            store.delete_users(result.succeeded)
+            if result.errors:
+                show_error(f"تم حذف {len(result.succeeded)} مستخدم، وفشل حذف {len(result.errors)}")
+            else:
+                show_success(f"تم حذف {len(result.succeeded)} مستخدم بنجاح")
+            return result
+        finally:
+            show_loading(False)
+
     # مكونات الواجهة
     def get_navigation_rail(user):
         destinations = [
@@ -408,6 +774,13 @@ def main(page: ft.Page):
 
         def on_nav_change(e):
             index = e.control.selected_index
+            if index != 2:
+                # مغادرة شاشة الشات توقف التحديث التلقائي الخاص بها
+                stop_chat_updates()
+            if index != 1 and thumbnails:
+                thumbnails.cancel_all()
+            view_cancel.set()
+            store_listeners.clear()
             try:
                 if index == 0:
                     show_home()
@@ -473,11 +846,162 @@ def main(page: ft.Page):
             ]
         )
 
+    def warm_up():
+        """جلب بيانات المحتوى والشات والمستخدمين بالتوازي بعد الدخول لملء الذاكرة المؤقتة"""
+        nonlocal warmup
+        user = page.user
+        jobs = {
+            "content": (get_content, (user.department, user.division)),
+            "messages": (get_chat_messages, (user.department, user.division)),
+        }
+        if user.role == "admin":
+            jobs["users"] = (get_users, ())
+
+        def report(group):
+            timings = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in group.timings.items())
+            logger.info("warm-up finished in %.2fs (%s)", group.elapsed, timings)
+
+        warmup = TaskGroup(tasks).start(jobs, on_complete=report)
+        start_sync()
+        # إرسال الرسائل المنتظرة لهذا المستخدم فقط (الملف مشترك مع الصفحات الأخرى)
+        outbox.start(user.code)
+
+    def start_sync():
+        """مزامنة بيانات المستخدم الحالي مع النسخة المحلية في الخلفية بمؤشر updated_since"""
+        nonlocal store_scope
+        user = page.user
+        department, division = user.department, user.division
+        # الطلبات محدودة بصفحة واحدة دائماً؛ السيرفر الذي لا يدعم updated_since يعيد أول صفحة،
+        # ولا نعتبرها تغييراً إن لم يتغير محتواها (ETag أو بصمة الاستجابة)
+        etags = {}
+        digests = {}
+
+        def pull_list(name, url, since, limit):
+            url += f"&limit={limit}&offset=0"
+            if since:
+                url += f"&updated_since={since}"
+            headers = {"Content-Type": "application/json"}
+            if etags.get(name):
+                headers["If-None-Match"] = etags[name]
+            response = api.get(url, endpoint=name, headers=headers)
+            if response.status_code == 304:
+                return SyncBatch([], cursor=since)
+            if response.status_code != 200:
+                return None
+            etags[name] = response.headers.get("ETag")
+            digest = hashlib.sha1(response.content).hexdigest()
+            if digests.get(name) == digest:
+                return SyncBatch([], cursor=since)
+            digests[name] = digest
+            return SyncBatch.from_response(
+                response.json(), since, lambda item: item.get("updated_at") or item.get("upload_date") or ""
+            )
+
+        def pull_content(since):
+            url = "api.php?table=content"
+            if department and division:
+                url += f"&department={department}&division={division}"
+            return pull_list("content", url, since, CONTENT_PAGE_SIZE)
+
+        def apply_content(batch):
+            items = Content.from_json_list(batch.items)
+            store.put_content(items)
+            store.delete_content(batch.deleted)
+            if not batch.delta:
+                # بدون updated_since لا يصل الحذف من السيرفر: ما غاب عن مدى الصفحة الأولى محذوف
+                dates = sorted(str(item.upload_date) for item in items)
+                between = (dates[0], dates[-1]) if len(items) >= CONTENT_PAGE_SIZE else None
+                store.prune_content(department, division, [item.id for item in items], between)
+            content_cache.pop(f"{department}-{division}")
+
+        def pull_messages(since):
+            # مؤشر الرسائل هو أحدث رسالة محفوظة (يتقدم أيضاً مع تحديثات شاشة الشات)
+            cursor = store.last_message_cursor(department, division)
+            try:
+                if cursor:
+                    items = chat_transport.fetch(department, division, cursor)
+                else:
+                    items = chat_transport.fetch(department, division, limit=CHAT_PAGE_SIZE)
+            except TransportError:
+                return None
+            messages = [m for m in Message.from_json_list(items) if m.cursor > cursor]
+            return SyncBatch(messages, cursor=max((m.cursor for m in messages), default=cursor))
+
+        def apply_messages(batch):
+            store.put_messages(batch.items)
+
+        sync.add("content", pull_content, apply_content)
+        sync.add("messages", pull_messages, apply_messages)
+        if user.role == "admin":
+            def apply_users(batch):
+                users = User.from_json_list(batch.items)
+                store.put_users(users)
+                store.delete_users(batch.deleted)
+                if not batch.delta and len(users) < USERS_PAGE_SIZE:
+                    # صفحة ناقصة تعني الدليل كله، فالغائب عنها محذوف على السيرفر
+                    store.prune_users([user.code for user in users])
+                users_cache.pop("all")
+
+            # بدون updated_since لا نعيد تنزيل الدليل دورياً؛ شاشة المستخدمين تؤكد تعديلاتها بنفسها
+            sync.add(
+                "users",
+                lambda since: pull_list("users", "api.php?table=users&action=all", since, USERS_PAGE_SIZE),
+                apply_users,
+                delta_only=True,
+            )
+        if store_scope:
+            store.close_scope(*store_scope)
+        store_scope = (department, division, user.role == "admin")
+        store.open_scope(*store_scope)
+        sync.start(LocalStore.scope_name(department, division))
+
     def logout():
+        nonlocal store_scope
+        pollers.stop_all()
+        sync.stop()
+        store_listeners.clear()
+        if warmup:
+            warmup.cancel()
+        tasks.cancel_all()
+        if thumbnails:
+            thumbnails.cancel_all()
+        view_cancel.set()
+        chat_transport.close()
+        # بيانات المستخدم السابق لا يجب أن تظهر للمستخدم التالي
+        cache.clear()
+        thumbnail_cache.clear()
         page.user = None
         page.client_storage.clear()
+        auth.clear()
+        # رسائل المستخدم السابق غير المرسلة لا ترسل برمز مستخدم آخر، ورسائل الصفحات الأخرى تبقى
+        outbox.clear()
+        outbox_bubbles.clear()
+        # النسخة المحلية مشتركة بين الصفحات: يحذف نطاق هذا المستخدم فقط إن لم تستخدمه صفحة أخرى
+        if store_scope:
+            store.close_scope(*store_scope)
+            store_scope = None
         login_screen()
 
+    def on_session_expired():
+        # كل الطلبات التي يرفض السيرفر رمزها تنتهي هنا (بعد فشل التجديد)
+        if page.user is None:
+            return
+        logout()
+        show_error("انتهت الجلسة، يرجى تسجيل الدخول مرة أخرى")
+
+    api.on_unauthorized = on_session_expired
+
+    def verify_session():
+        """التحقق من الرمز المحفوظ في الخلفية بعد عرض الجلسة المستعادة"""
+        try:
+            user_data = auth.verify()
+            if user_data and page.user:
+                page.user = User.from_json(user_data)
+                page.client_storage.set("user", json.dumps(page.user.to_json()))
+        except Exception:
+            # بدون اتصال أو استجابة غير متوقعة: نبقى على الجلسة المحفوظة
+            pass
+
     def login_screen():
         code_field = ft.TextField(
             label="كود المستخدم",
@@ -499,9 +1023,10 @@ def main(page: ft.Page):
         )
 
         def on_login(e):
-            user = login_user(code_field.value, password_field.value)
-            if user:
-                show_home()
+            run_in_background(
+                login_user, code_field.value, password_field.value,
+                on_done=lambda user: (warm_up(), show_home()) if user else None,
+            )
 
         login_card = ft.Card(
             elevation=8,
@@ -565,14 +1090,65 @@ def main(page: ft.Page):
 
     @require_login
     def show_content_list():
-        content = get_content(page.user.department, page.user.division)
+        nonlocal thumbnails, view_cancel
+        view_cancel.set()
+        cancel = view_cancel = threading.Event()
+        # عرض النسخة المخزنة فوراً (من الذاكرة أو النسخة المحلية) ثم التحديث في الخلفية
+        content = (
+            content_cache.get(f"{page.user.department}-{page.user.division}")
+            or store.content(page.user.department, page.user.division)
+        )
+        content_pager = Pager(
+            lambda offset, limit: get_content_page(page.user.department, page.user.division, offset, limit),
+            key=lambda item: item.id,
+            next_cursor=len,
+            page_size=CONTENT_PAGE_SIZE,
+            items=content,
+        )
+
+        def refresh_content(e, force=False):
+            def apply(result):
+                nonlocal content
+                if cancel.is_set():
+                    return
+                content = result
+                content_pager.reset(content)
+                build_content_list()
+                page.update()
+
+            run_in_background(get_content, page.user.department, page.user.division, force, on_done=apply)
 
-        def refresh_content(e):
+        # تأكيد الحذف المحلي مع السيرفر في الخلفية بعد توقف المشرف عن التعديل
+        reconcile_content = Debouncer(5, lambda: None if cancel.is_set() else refresh_content(None, force=True))
+
+        def on_content_synced():
             nonlocal content
-            content = get_content(page.user.department, page.user.division)
-            content_list.controls = build_content_list()
+            if cancel.is_set():
+                return
+            content = store.content(page.user.department, page.user.division)
+            content_pager.reset(content)
+            build_content_list()
             page.update()
 
+        watch_store("content", on_content_synced)
+
+        def remove_content(id):
+            # حذف الصف فقط بدلاً من إعادة تحميل المحتوى كله
+            nonlocal content
+            content = [item for item in content if item.id != id]
+            content_pager.remove([id])
+            build_content_list()
+            page.update()
+            reconcile_content()
+
+        def load_more_content():
+            nonlocal content
+            new_items = content_pager.load_next()
+            if new_items:
+                content = content + new_items
+                build_content_list()
+                page.update()
+
         def get_file_icon(file_type):
             if file_type == "pdf":
                 return ft.Icons.PICTURE_AS_PDF
@@ -583,111 +1159,201 @@ def main(page: ft.Page):
             else:
                 return ft.Icons.INSERT_DRIVE_FILE
 
-        def build_content_list():
-            controls = []
-            for item in content:
-                def on_view(e, item=item):
-                    url = f"https://ki74.alalsunacademy.com/{item.file_path}"
-                    if item.file_type == "pdf":
-                        webbrowser.open(url)
-                    elif item.file_type in ["jpg", "png", "jpeg"]:
-                        show_image_viewer(url)
-                    elif item.file_type == "txt":
-                        show_text_viewer(url)
-
-                def on_delete(e, item=item):
-                    def confirm_delete(e):
-                        if delete_content(item.id, page.user.department, page.user.division):
-                            refresh_content(None)
-                        page.dialog.open = False
-                        page.update()
-
-                    page.dialog = ft.AlertDialog(
-                        title=ft.Text("تأكيد الحذف", text_align=ft.TextAlign.CENTER),
-                        content=ft.Text("هل أنت متأكد من حذف هذا المحتوى؟", text_align=ft.TextAlign.CENTER),
-                        actions=[
-                            ft.TextButton("إلغاء", on_click=lambda e: setattr(page.dialog, "open", False)),
-                            ft.TextButton("حذف", on_click=confirm_delete, style=ft.ButtonStyle(color=ft.Colors.RED)),
-                        ],
-                        actions_alignment=ft.MainAxisAlignment.CENTER,
+        # مكان الأيقونة في صفوف الصور، تستبدل بالصورة المصغرة عند ظهور الصف
+        thumbnail_slots = {}
+
+        def show_thumbnail(key, data):
+            slot = thumbnail_slots.get(key)
+            if slot is None:
+                return
+            slot.content = ft.Image(src_base64=data, width=56, height=56, fit=ft.ImageFit.COVER, border_radius=8)
+            if slot.page:
+                slot.update()
+
+        def hide_thumbnail(key):
+            slot = thumbnail_slots.get(key)
+            if slot is None:
+                return
+            slot.content = slot.data
+            if slot.page:
+                slot.update()
+
+        if thumbnails:
+            thumbnails.cancel_all()
+        thumbnails = ThumbnailLoader(
+            thumbnail_tasks,
+            get_thumbnail,
+            thumbnail_cache,
+            key=lambda item: item.id,
+            on_show=show_thumbnail,
+            on_hide=hide_thumbnail,
+        )
+        loader = thumbnails
+
+        def build_content_row(item):
+            def on_view(e):
+                if item.file_type == "pdf":
+                    # فتح النسخة المحلية بدلاً من تحميل الملف في المتصفح كل مرة
+                    run_in_background(
+                        get_local_file, item,
+                        on_done=lambda path: open_local_file(path) if path else None,
                     )
-                    page.dialog.open = True
+                elif item.file_type in ["jpg", "png", "jpeg"]:
+                    show_image_viewer(item)
+                elif item.file_type == "txt":
+                    show_text_viewer(item)
+
+            blob_key = BlobCache.key_for(item.id, item.file_path)
+            pin_button = ft.IconButton(
+                ft.Icons.PUSH_PIN if blob_cache.is_pinned(blob_key) else ft.Icons.PUSH_PIN_OUTLINED,
+                tooltip="حفظ للاستخدام بدون إنترنت",
+            )
+
+            def on_pin(e):
+                def apply(path):
+                    if not path:
+                        return
+                    pinned = not blob_cache.is_pinned(blob_key)
+                    blob_cache.pin(blob_key, pinned)
+                    pin_button.icon = ft.Icons.PUSH_PIN if pinned else ft.Icons.PUSH_PIN_OUTLINED
+                    show_success("تم حفظ الملف على الجهاز" if pinned else "تم إلغاء حفظ الملف")
+
+                run_in_background(get_local_file, item, on_done=apply)
+
+            pin_button.on_click = on_pin
+
+            def on_delete(e):
+                def confirm_delete(e):
+                    page.dialog.open = False
                     page.update()
+                    run_in_background(
+                        delete_content, item.id, page.user.department, page.user.division,
+                        on_done=lambda ok: remove_content(item.id) if ok else None,
+                    )
 
-                actions = [
-                    ft.IconButton(ft.Icons.VISIBILITY, on_click=on_view, tooltip="عرض"),
-                ]
-                if page.user.role == "admin":
-                    actions.append(ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, on_click=on_delete, tooltip="حذف"))
-
-                controls.append(
-                    ft.Card(
-                        content=ft.Container(
-                            content=ft.ResponsiveRow(
-                                [
-                                    ft.Column(
-                                        col={"sm": 2, "md": 1},
-                                        controls=[
-                                            ft.IconButton(
-                                                icon=get_file_icon(item.file_type),
-                                                icon_size=40,
-                                                icon_color=page.theme.color_scheme.primary,
-                                                tooltip=item.file_type.upper(),
-                                                on_click=on_view
-                                            )
-                                        ],
-                                        alignment=ft.MainAxisAlignment.CENTER,
-                                        horizontal_alignment=ft.CrossAxisAlignment.CENTER,
-                                    ),
-                                    ft.Column(
-                                        col={"sm": 7, "md": 9},
-                                        controls=[
-                                            ft.Text(item.title, weight=ft.FontWeight.BOLD, size=16),
-                                            ft.Text(f"نوع الملف: {item.file_type}", size=14, color=ft.Colors.SECONDARY),
-                                            ft.Text(f"حجم الملف: {item.formatted_size}", size=14, color=ft.Colors.SECONDARY),
-                                            ft.Text(f"تم الرفع بواسطة: {item.uploaded_by}", size=14, color=ft.Colors.SECONDARY),
-                                            ft.Text(f"تاريخ الرفع: {item.upload_date}", size=14, color=ft.Colors.SECONDARY),
-                                            ft.Text(f"نبذة: {item.description}", size=14, max_lines=2, overflow=ft.TextOverflow.ELLIPSIS),
-                                        ],
-                                        alignment=ft.MainAxisAlignment.CENTER,
-                                        expand=True,
-                                    ),
-                                    ft.Column(
-                                        col={"sm": 3, "md": 2},
-                                        controls=actions,
-                                        alignment=ft.MainAxisAlignment.CENTER,
-                                        horizontal_alignment=ft.CrossAxisAlignment.END,
-                                    ),
+                page.dialog = ft.AlertDialog(
+                    title=ft.Text("تأكيد الحذف", text_align=ft.TextAlign.CENTER),
+                    content=ft.Text("هل أنت متأكد من حذف هذا المحتوى؟", text_align=ft.TextAlign.CENTER),
+                    actions=[
+                        ft.TextButton("إلغاء", on_click=lambda e: setattr(page.dialog, "open", False)),
+                        ft.TextButton("حذف", on_click=confirm_delete, style=ft.ButtonStyle(color=ft.Colors.RED)),
+                    ],
+                    actions_alignment=ft.MainAxisAlignment.CENTER,
+                )
+                page.dialog.open = True
+                page.update()
+
+            actions = [
+                ft.IconButton(ft.Icons.VISIBILITY, on_click=on_view, tooltip="عرض"),
+                pin_button,
+            ]
+            if page.user.role == "admin":
+                actions.append(ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, on_click=on_delete, tooltip="حذف"))
+
+            file_icon = ft.IconButton(
+                icon=get_file_icon(item.file_type),
+                icon_size=40,
+                icon_color=page.theme.color_scheme.primary,
+                tooltip=item.file_type.upper(),
+                on_click=on_view
+            )
+            if item.file_type in IMAGE_TYPES:
+                # الأيقونة تحفظ في data لإعادتها عند خروج الصف من الشاشة
+                file_icon = ft.Container(
+                    content=file_icon,
+                    data=file_icon,
+                    width=56,
+                    height=56,
+                    alignment=ft.alignment.center,
+                    on_click=on_view,
+                )
+                thumbnail_slots[item.id] = file_icon
+                data = loader.shown(item.id)
+                if data:
+                    file_icon.content = ft.Image(src_base64=data, width=56, height=56, fit=ft.ImageFit.COVER, border_radius=8)
+
+            return ft.Card(
+                content=ft.Container(
+                    content=ft.ResponsiveRow(
+                        [
+                            ft.Column(
+                                col={"sm": 2, "md": 1},
+                                controls=[file_icon],
+                                alignment=ft.MainAxisAlignment.CENTER,
+                                horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                            ),
+                            ft.Column(
+                                col={"sm": 7, "md": 9},
+                                controls=[
+                                    ft.Text(item.title, weight=ft.FontWeight.BOLD, size=16),
+                                    ft.Text(f"نوع الملف: {item.file_type}", size=14, color=ft.Colors.SECONDARY),
+                                    ft.Text(f"حجم الملف: {item.formatted_size}", size=14, color=ft.Colors.SECONDARY),
+                                    ft.Text(f"تم الرفع بواسطة: {item.uploaded_by}", size=14, color=ft.Colors.SECONDARY),
+                                    ft.Text(f"تاريخ الرفع: {item.upload_date}", size=14, color=ft.Colors.SECONDARY),
+                                    ft.Text(f"نبذة: {item.description}", size=14, max_lines=2, overflow=ft.TextOverflow.ELLIPSIS),
                                 ],
-                                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
-                                vertical_alignment=ft.CrossAxisAlignment.CENTER,
+                                alignment=ft.MainAxisAlignment.CENTER,
+                                expand=True,
                             ),
-                            padding=16,
-                        ),
-                        elevation=3,
-                    )
-                )
-            return controls
+                            ft.Column(
+                                col={"sm": 3, "md": 2},
+                                controls=actions,
+                                alignment=ft.MainAxisAlignment.CENTER,
+                                horizontal_alignment=ft.CrossAxisAlignment.END,
+                            ),
+                        ],
+                        alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                        vertical_alignment=ft.CrossAxisAlignment.CENTER,
+                    ),
+                    padding=16,
+                ),
+                elevation=3,
+            )
+
+        content_list = ft.ListView(expand=True, spacing=10, padding=10)
+        # الصفوف تبنى عند ظهورها فقط، وتعاد للعناصر التي لم تتغير بين التحديثات
+        content_rows = VirtualList(
+            content_list,
+            build_content_row,
+            key=lambda item: item.id,
+            signature=lambda item: (item.title, item.file_type, item.file_path, item.file_size, item.uploaded_by, item.upload_date, item.description),
+            on_end_reached=lambda: run_in_background(load_more_content) if content_pager.has_more else None,
+            # الصور المصغرة تحمل للصفوف الظاهرة فقط
+            on_visible_change=lambda items: loader.request([item for item in items if item.file_type in IMAGE_TYPES]),
+        )
+
+        # فهرس البحث يعاد بناؤه فقط عند تغير المحتوى وليس مع كل حرف
+        search_index = SearchIndex(["title", "description", "uploaded_by", "file_type"], key=lambda item: item.id)
+        content_by_id = {}
+
+        def build_content_list():
+            nonlocal content_by_id
+            content_by_id = {item.id: item for item in content}
+            search_index.build(content)
+            content_rows.forget(content_by_id)
+            for key in [k for k in thumbnail_slots if k not in content_by_id]:
+                del thumbnail_slots[key]
+            filter_content(update=False)
+
+        def filter_content(update=True):
+            if not search_field.value:
+                content_rows.set_items(content)
+            else:
+                content_rows.set_items(content_by_id[key] for key in search_index.search(search_field.value))
+            if update:
+                page.update()
 
-        content_list = ft.ListView(controls=build_content_list(), expand=True, spacing=10, padding=10)
+        search_debouncer = Debouncer(0.3, filter_content)
 
         search_field = ft.TextField(
             label="بحث في المحتوى...",
-            on_change=lambda e: filter_content(),
+            on_change=lambda e: search_debouncer(),
             width=300,
             rtl=True,
             border_radius=10,
         )
 
-        def filter_content():
-            if not search_field.value:
-                content_list.controls = build_content_list()
-            else:
-                filtered = [item for item in content if search_field.value.lower() in item.title.lower()]
-                content_list.controls = [
-                    c for c in build_content_list() if any(item.title == c.content.content.controls[0].content.controls[1].controls[0].value for item in filtered)
-                ]
-            page.update()
+        build_content_list()
 
         main_content = ft.Container(
             content=ft.Column(
@@ -733,6 +1399,7 @@ def main(page: ft.Page):
             )
         )
         page.update()
+        refresh_content(None)
 
     @require_login
     @require_admin
@@ -757,35 +1424,105 @@ def main(page: ft.Page):
             max_lines=5,
         )
         file_name = ft.Text("لم يتم اختيار ملف", text_align=ft.TextAlign.CENTER)
-        file_path = [None]
+        file_paths = []
+        upload_progress = ft.ProgressBar(value=0, width=300, visible=False)
+        progress_text = ft.Text("", text_align=ft.TextAlign.CENTER, visible=False)
+        # حالة كل ملف عند رفع عدة ملفات
+        batch_status = ft.Column(spacing=5)
+        optimize_checkbox = ft.Checkbox(label="تصغير الصور وضغط النصوص قبل الرفع", value=True)
+        status_labels = {
+            UploadJob.PENDING: "في الانتظار",
+            UploadJob.UPLOADING: "جاري الرفع",
+            UploadJob.DONE: "تم الرفع",
+            UploadJob.FAILED: "فشل",
+        }
 
         def pick_file(e):
             file_picker = ft.FilePicker(
-                on_result=lambda result: on_file_picked(result, file_name, file_path)
+                on_result=lambda result: on_file_picked(result, file_name, file_paths)
             )
             page.overlay.append(file_picker)
             page.update()
             file_picker.pick_files(
                 allowed_extensions=["pdf", "jpg", "png", "jpeg", "txt"],
-                allow_multiple=False
+                allow_multiple=True
             )
 
-        def on_file_picked(result, file_name, file_path):
+        def on_file_picked(result, file_name, file_paths):
             if result.files:
-                file_name.value = f"الملف المختار: {result.files[0].name}"
-                file_path[0] = result.files[0].path
+                file_paths[:] = [f.path for f in result.files]
+                if len(result.files) == 1:
+                    file_name.value = f"الملف المختار: {result.files[0].name}"
+                else:
+                    file_name.value = f"تم اختيار {len(result.files)} ملف (العنوان يؤخذ من اسم كل ملف)"
+                batch_status.controls = []
                 page.update()
 
+        def upload_batch():
+            status_texts = {}
+            for path in file_paths:
+                job = UploadJob.from_path(path)
+                status_texts[path] = ft.Text(f"{job.title} ({job.file_type}): {status_labels[job.status]}", size=14)
+            batch_status.controls = list(status_texts.values())
+            page.update()
+
+            def on_update(job):
+                label = status_labels[job.status]
+                if job.status == UploadJob.UPLOADING:
+                    label += f" {int(job.progress * 100)}%"
+                status_texts[job.path].value = f"{job.title} ({job.file_type}): {label}"
+                page.update()
+
+            def on_finished(jobs):
+                if jobs and all(job.status == UploadJob.DONE for job in jobs):
+                    description_field.value = ""
+                    file_name.value = "لم يتم اختيار ملف"
+                    file_paths.clear()
+                    page.update()
+
+            run_in_background(
+                upload_many,
+                list(file_paths), page.user.code, page.user.department, page.user.division, description_field.value or "",
+                on_update=on_update,
+                optimize=optimize_checkbox.value,
+                on_done=on_finished,
+            )
+
         def upload(e):
-            if not title_field.value or not file_path[0] or not description_field.value:
+            if len(file_paths) > 1:
+                upload_batch()
+                return
+            if not title_field.value or not file_paths or not description_field.value:
                 show_error("يرجى إدخال العنوان، النبذة، واختيار ملف")
                 return
-            if upload_content(title_field.value, file_path[0], page.user.code, page.user.department, page.user.division, description_field.value):
-                title_field.value = ""
-                description_field.value = ""
-                file_name.value = "لم يتم اختيار ملف"
-                file_path[0] = None
-                show_content_list()
+
+            def on_progress(value):
+                upload_progress.value = value
+                progress_text.value = f"{int(value * 100)}%"
+                page.update()
+
+            def on_uploaded(ok):
+                upload_progress.visible = False
+                progress_text.visible = False
+                page.update()
+                if ok:
+                    title_field.value = ""
+                    description_field.value = ""
+                    file_name.value = "لم يتم اختيار ملف"
+                    file_paths.clear()
+                    show_content_list()
+
+            upload_progress.value = 0
+            upload_progress.visible = True
+            progress_text.visible = True
+            page.update()
+            run_in_background(
+                upload_content,
+                title_field.value, file_paths[0], page.user.code, page.user.department, page.user.division, description_field.value,
+                progress=on_progress,
+                optimize=optimize_checkbox.value,
+                on_done=on_uploaded,
+            )
 
         main_content = ft.Container(
             content=ft.Column(
@@ -804,12 +1541,16 @@ def main(page: ft.Page):
                                     style=ft.ButtonStyle(padding=15),
                                 ),
                                 file_name,
+                                optimize_checkbox,
                                 ft.Container(height=16),
                                 ft.ElevatedButton(
                                     "رفع المحتوى",
                                     on_click=upload,
                                     style=ft.ButtonStyle(padding=15),
                                 ),
+                                upload_progress,
+                                progress_text,
+                                batch_status,
                             ],
                             alignment=ft.MainAxisAlignment.CENTER,
                         ),
@@ -841,80 +1582,186 @@ def main(page: ft.Page):
 
     @require_login
     def show_chat():
-        messages = get_chat_messages(page.user.department, page.user.division)
+        # عرض الرسائل المخزنة فوراً (من الذاكرة أو النسخة المحلية) إن وجدت، وإلا تحميلها في الخلفية
+        messages = (
+            messages_cache.get(f"{page.user.department}-{page.user.division}")
+            or store.messages(page.user.department, page.user.division, CHAT_PAGE_SIZE)
+            or None
+        )
+        loaded = messages is not None
+        messages = messages or []
+        last_cursor = max((m.cursor for m in messages), default=0)
+        refresh_lock = threading.Lock()
+        # فقاعات الرسائل المرسلة من هذا الجهاز قبل وصولها من السيرفر
+        pending_bubbles = {}
+        # السجل الأقدم يحمل صفحة بصفحة بمؤشر أقدم رسالة معروضة
+        history = Pager(
+            lambda before, limit: get_older_messages(page.user.department, page.user.division, before, limit),
+            key=lambda m: m.id,
+            next_cursor=lambda items: min(m.cursor for m in items),
+            page_size=CHAT_PAGE_SIZE,
+            items=messages,
+        )
 
-        def refresh_messages(e=None):
+        def load_messages():
+            nonlocal messages, last_cursor, loaded
+            result = get_chat_messages(page.user.department, page.user.division)
+            with refresh_lock:
+                messages = result
+                last_cursor = max((m.cursor for m in messages), default=0)
+                history.reset(messages)
+                chat_list.controls = build_chat_list()
+                loaded = True
+            page.update()
+
+        def load_older_messages():
             nonlocal messages
-            messages = get_chat_messages(page.user.department, page.user.division)
-            chat_list.controls = build_chat_list()
+            older = sorted(history.load_next(), key=lambda m: m.cursor)
+            if not older:
+                return
+            with refresh_lock:
+                messages = older + messages
+                # إضافة الرسائل في الأعلى دون القفز لآخر القائمة
+                chat_list.auto_scroll = False
+                chat_list.controls[0:0] = [build_message_bubble(m) for m in older]
+            page.update()
+            chat_list.auto_scroll = True
+
+        def on_chat_scroll(e):
+            if e.pixels is not None and e.pixels <= 200 and loaded and history.has_more:
+                run_in_background(load_older_messages)
+
+        def poll_messages():
+            if not loaded:
+                return
+            new_messages = get_chat_messages(page.user.department, page.user.division, since=last_cursor, wait=True)
+            # خيط شاشة شات سابقة: الشاشة الجديدة تجلب نفس الرسائل من مؤشرها
+            if not chat_poller.stop_event.is_set():
+                append_messages(new_messages)
+
+        def refresh_messages(e=None):
+            # مزامنة تدريجية: جلب الرسائل الجديدة فقط وإضافة فقاعاتها إلى القائمة
+            new_messages = get_chat_messages(page.user.department, page.user.division, since=last_cursor)
+            append_messages(new_messages)
+
+        def append_messages(new_messages):
+            nonlocal messages, last_cursor
+            with refresh_lock:
+                # قد يصل نفس الرسائل من الإرسال ومن التحديث التلقائي معاً
+                new_messages = [m for m in new_messages if m.cursor > last_cursor]
+                if not new_messages:
+                    return
+                messages = messages + new_messages
+                last_cursor = max(m.cursor for m in new_messages)
+                for m in new_messages:
+                    pending = pending_bubbles.pop(m.id, None)
+                    if pending is not None and pending in chat_list.controls:
+                        # رسالة أرسلناها: تستبدل فقاعتها المؤقتة في مكانها
+                        outbox_bubbles.pop(m.id, None)
+                        chat_list.controls[chat_list.controls.index(pending)] = build_message_bubble(m)
+                    else:
+                        chat_list.controls.append(build_message_bubble(m))
             page.update()
 
+        def on_messages_synced():
+            # رسائل وصلت عبر المزامنة في الخلفية (مثلاً أثناء انقطاع الاستطلاع)
+            if loaded:
+                append_messages(store.messages(page.user.department, page.user.division, CHAT_PAGE_SIZE))
+
+        watch_store("messages", on_messages_synced)
+
+        def show_pending(payload):
+            message = Message(
+                payload["id"],
+                payload["content"],
+                payload["sender_id"],
+                page.user.username,
+                payload["department"],
+                payload["division"],
+                payload["timestamp"],
+            )
+            bubble = build_message_bubble(message, pending=True)
+            pending_bubbles[message.id] = bubble
+            return bubble
+
         def send(e):
             if not message_field.value:
                 show_error("يرجى إدخال رسالة")
                 return
-            if send_message(page.user.code, page.user.department, page.user.division, message_field.value):
-                message_field.value = ""
-                refresh_messages()
+            # الفقاعة تظهر فوراً والإرسال يتم من صندوق الصادر في الخلفية
+            payload = send_message(page.user.code, page.user.department, page.user.division, message_field.value)
+            message_field.value = ""
+            with refresh_lock:
+                chat_list.controls.append(show_pending(payload))
+            page.update()
 
-        def build_chat_list():
-            controls = []
-            for message in messages:
-                is_me = message.sender_id == page.user.code
-                controls.append(
-                    ft.Container(
-                        content=ft.Column(
-                            [
-                                ft.Text(
-                                    message.username,
-                                    weight=ft.FontWeight.BOLD,
-                                    size=14,
-                                ),
-                                ft.Text(
-                                    message.content,
-                                    size=16,
-                                    max_lines=10,
-                                    overflow=ft.TextOverflow.ELLIPSIS,
-                                ),
-                                ft.Text(
-                                    message.timestamp,
-                                    size=12,
-                                    color=ft.Colors.SECONDARY,
-                                ),
-                            ],
-                            alignment=ft.MainAxisAlignment.START,
-                            spacing=5,
+        def build_message_bubble(message, pending=False):
+            is_me = message.sender_id == page.user.code
+            status = ft.Text(
+                "جاري الإرسال..." if pending else message.timestamp,
+                size=12,
+                color=ft.Colors.SECONDARY,
+            )
+            if pending:
+                outbox_bubbles[message.id] = status
+            return ft.Container(
+                content=ft.Column(
+                    [
+                        ft.Text(
+                            message.username,
+                            weight=ft.FontWeight.BOLD,
+                            size=14,
                         ),
-                        padding=ft.padding.all(12),
-                        margin=ft.margin.only(
-                            left=100 if not is_me else 20, 
-                            right=20 if not is_me else 100, 
-                            top=4, 
-                            bottom=4
+                        ft.Text(
+                            message.content,
+                            size=16,
+                            max_lines=10,
+                            overflow=ft.TextOverflow.ELLIPSIS,
                         ),
-                        bgcolor=page.theme.color_scheme.primary_container if is_me else page.theme.color_scheme.surface,
-                        border_radius=15,
-                        alignment=ft.alignment.center_right if is_me else ft.alignment.center_left,
-                        shadow=ft.BoxShadow(blur_radius=3, color=ft.Colors.BLACK12),
-                    )
-                )
-            return controls
+                        status,
+                    ],
+                    alignment=ft.MainAxisAlignment.START,
+                    spacing=5,
+                ),
+                padding=ft.padding.all(12),
+                margin=ft.margin.only(
+                    left=100 if not is_me else 20, 
+                    right=20 if not is_me else 100, 
+                    top=4, 
+                    bottom=4
+                ),
+                bgcolor=page.theme.color_scheme.primary_container if is_me else page.theme.color_scheme.surface,
+                border_radius=15,
+                alignment=ft.alignment.center_right if is_me else ft.alignment.center_left,
+                shadow=ft.BoxShadow(blur_radius=3, color=ft.Colors.BLACK12),
+            )
+
+        def build_chat_list():
+            # الرسائل التي ما زالت في صندوق الصادر تعرض في آخر القائمة
+            sent_ids = {message.id for message in messages}
+            pending = [
+                show_pending(payload)
+                for payload in outbox.pending(page.user.department, page.user.division)
+                if payload["id"] not in sent_ids
+            ]
+            return [build_message_bubble(message) for message in messages] + pending
 
         chat_list = ft.ListView(
             controls=build_chat_list(), 
             expand=True, 
             spacing=10, 
             padding=10,
-            auto_scroll=True
+            auto_scroll=True,
+            on_scroll=on_chat_scroll,
+            on_scroll_interval=100,
         )
 
-        # تحديث الرسائل تلقائياً كل 10 ثواني
-        def auto_refresh():
-            while True:
-                time.sleep(10)
-                refresh_messages()
-
-        threading.Thread(target=auto_refresh, daemon=True).start()
+        # تحديث الرسائل تلقائياً عبر طريقة النقل الحالية (SSE/استطلاع طويل/كل 10 ثواني)
+        # ويستبدل أي مهمة شات سابقة لهذه الجلسة
+        stop_chat_updates()
+        chat_poller = pollers.start("chat", poll_messages, lambda: chat_transport.interval)
+        if not loaded:
+            run_in_background(load_messages)
 
         message_field = ft.TextField(
             label="اكتب رسالتك...",
@@ -933,7 +1780,7 @@ def main(page: ft.Page):
                     ft.Text("الشات", size=24, weight=ft.FontWeight.BOLD, text_align=ft.TextAlign.CENTER),
                     ft.ElevatedButton(
                         "تحديث الرسائل",
-                        on_click=refresh_messages,
+                        on_click=lambda e: run_in_background(refresh_messages),
                         style=ft.ButtonStyle(padding=15),
                     ),
                     chat_list,
@@ -974,72 +1821,331 @@ def main(page: ft.Page):
     @require_login
     @require_admin
     def show_user_management():
-        users = get_users()
+        nonlocal view_cancel
+        view_cancel.set()
+        cancel = view_cancel = threading.Event()
+        users = users_cache.get("all") or store.users()
+        # الصفحات التالية تحمل عند التمرير لنهاية القائمة أو عند بحث لا يجد ما يكفي في المحمل
+        directory = Pager(
+            get_users_page,
+            key=lambda u: u.code,
+            next_cursor=len,
+            page_size=USERS_PAGE_SIZE,
+            items=users,
+        )
+        user_index = SearchIndex(["code", "username", "department", "division", "role"], key=lambda u: u.code)
+        users_by_code = {}
+        # المستخدمون المحددون للحذف المتعدد
+        selected_codes = set()
 
-        def refresh_users(e):
+        def index_users(new_users):
+            users_by_code.update((u.code, u) for u in new_users)
+            user_index.add(new_users)
+            update_filter_options()
+
+        def reset_directory(result):
+            nonlocal users
+            users = result
+            directory.reset(users)
+            users_by_code.clear()
+            user_index.build([])
+            index_users(users)
+            selected_codes.intersection_update(users_by_code)
+            update_selection()
+            filter_users(update=False)
+            user_count.value = f"{len(users)} مستخدم"
+
+        def load_more_users():
             nonlocal users
-            users = get_users()
-            user_list.controls = build_user_list()
+            if cancel.is_set():
+                return
+            new_users = directory.load_next()
+            if not new_users or cancel.is_set():
+                return
+            users = directory.items
+            index_users(new_users)
+            user_count.value = f"{len(users)} مستخدم"
+            filter_users()
+
+        def on_users_synced():
+            if cancel.is_set():
+                return
+            reset_directory(store.users())
             page.update()
 
-        def build_user_list():
-            controls = []
-            for u in users:
-                def on_delete(e, u=u):
-                    def confirm_delete(e):
-                        if delete_user(u.code):
-                            refresh_users(None)
-                        page.dialog.open = False
-                        page.update()
-
-                    page.dialog = ft.AlertDialog(
-                        title=ft.Text("تأكيد الحذف", text_align=ft.TextAlign.CENTER),
-                        content=ft.Text("هل أنت متأكد من حذف هذا المستخدم؟", text_align=ft.TextAlign.CENTER),
-                        actions=[
-                            ft.TextButton("إلغاء", on_click=lambda e: setattr(page.dialog, "open", False)),
-                            ft.TextButton("حذف", on_click=confirm_delete, style=ft.ButtonStyle(color=ft.Colors.RED)),
-                        ],
-                        actions_alignment=ft.MainAxisAlignment.CENTER,
-                    )
-                    page.dialog.open = True
+        watch_store("users", on_users_synced)
+
+        def refresh_users(e=None, force=False):
+            """أول صفحة فقط (من الذاكرة إن كانت صالحة)، وforce=True بعد تعديلات لا تعرف نتيجتها محلياً"""
+            def apply(result):
+                if cancel.is_set():
+                    return
+                reset_directory(result)
+                page.update()
+
+            if force:
+                users_cache.pop("all")
+            run_in_background(get_users, on_done=apply)
+
+        def update_filter_options():
+            for dropdown, field in filter_fields:
+                values = sorted({getattr(u, field) for u in users_by_code.values() if getattr(u, field)})
+                current = [option.key for option in dropdown.options[1:]]
+                if values != current:
+                    dropdown.options = [ft.dropdown.Option("", "الكل")] + [ft.dropdown.Option(v) for v in values]
+
+        def filter_users(update=True):
+            query = search_field.value
+            matched = (users_by_code[code] for code in user_index.search(query)) if query else users_by_code.values()
+            conditions = [(field, dropdown.value) for dropdown, field in filter_fields if dropdown.value]
+            if conditions:
+                matched = (u for u in matched if all(getattr(u, field) == value for field, value in conditions))
+            matched = list(matched)
+            user_rows.set_items(matched)
+            if (query or conditions) and len(matched) < user_rows.window and directory.has_more:
+                # نتائج البحث لا تملأ الشاشة: تحميل الصفحة التالية والبحث فيها أيضاً
+                run_in_background(load_more_users)
+            if update:
+                page.update()
+
+        def update_selection():
+            delete_selected_button.text = f"حذف المحدد ({len(selected_codes)})"
+            delete_selected_button.disabled = not selected_codes
+
+        def on_select(e, code):
+            if e.control.value:
+                selected_codes.add(code)
+            else:
+                selected_codes.discard(code)
+            update_selection()
+            page.update()
+
+        # الأكواد التي عدلت محلياً ولم تؤكد بعد: True للإضافة و False للحذف
+        pending_changes = {}
+
+        def reconcile_changes():
+            """تأكيد التعديلات المحلية بطلب واحد لأول صفحة، دون إعادة تحميل الدليل كله"""
+            if cancel.is_set() or not pending_changes:
+                return
+            changes = dict(pending_changes)
+            pending_changes.clear()
+            first_page = get_users_page(0, USERS_PAGE_SIZE)
+            if first_page is None or cancel.is_set():
+                return
+            users_cache["all"] = first_page
+            on_server = {u.code: u for u in first_page}
+            # الصفحة الأولى ناقصة تعني أنها الدليل كله، فغياب الكود منها يعني أنه غير موجود
+            complete = len(first_page) < USERS_PAGE_SIZE
+            present = [on_server[code] for code in changes if code in on_server]
+            missing = [code for code, added in changes.items() if added and complete and code not in on_server]
+            if missing:
+                store.delete_users(missing)
+                apply_remove(missing)
+            if present:
+                apply_upsert(present)
+            if missing or present:
+                page.update()
+
+        # مرة واحدة بعد سلسلة تعديلات
+        reconcile_users = Debouncer(10, reconcile_changes)
+
+        def apply_upsert(new_users):
+            nonlocal users
+            codes = {u.code for u in new_users}
+            replaced = codes & users_by_code.keys()
+            directory.remove(codes)
+            directory.add(new_users)
+            users = directory.items
+            if replaced:
+                for u in new_users:
+                    users_by_code[u.code] = u
+                user_index.build(users)
+                update_filter_options()
+            else:
+                index_users(new_users)
+            user_count.value = f"{len(users)} مستخدم"
+            filter_users(update=False)
+
+        def apply_remove(codes):
+            nonlocal users
+            codes = set(codes)
+            directory.remove(codes)
+            users = directory.items
+            for code in codes:
+                users_by_code.pop(code, None)
+            selected_codes.difference_update(codes)
+            user_index.build(users)
+            user_rows.forget(users_by_code)
+            update_selection()
+            user_count.value = f"{len(users)} مستخدم"
+            filter_users(update=False)
+
+        def insert_user(user):
+            # إضافة صف المستخدم الجديد فقط بدلاً من إعادة تحميل كل المستخدمين
+            apply_upsert([user])
+            page.update()
+            pending_changes[user.code] = True
+            reconcile_users()
+
+        def remove_users(codes):
+            # حذف الصفوف محلياً بدلاً من إعادة تحميل كل المستخدمين
+            apply_remove(codes)
+            page.update()
+            pending_changes.update((code, False) for code in codes)
+            reconcile_users()
+
+        def delete_selected(e):
+            codes = sorted(selected_codes)
+
+            def confirm_delete(e):
+                page.dialog.open = False
+                page.update()
+                run_in_background(
+                    delete_users, codes,
+                    on_done=lambda result: remove_users(result.succeeded),
+                )
+
+            page.dialog = ft.AlertDialog(
+                title=ft.Text("تأكيد الحذف", text_align=ft.TextAlign.CENTER),
+                content=ft.Text(f"هل أنت متأكد من حذف {len(codes)} مستخدم؟", text_align=ft.TextAlign.CENTER),
+                actions=[
+                    ft.TextButton("إلغاء", on_click=lambda e: setattr(page.dialog, "open", False)),
+                    ft.TextButton("حذف", on_click=confirm_delete, style=ft.ButtonStyle(color=ft.Colors.RED)),
+                ],
+                actions_alignment=ft.MainAxisAlignment.CENTER,
+            )
+            page.dialog.open = True
+            page.update()
+
+        import_progress = ft.ProgressBar(width=300, visible=False)
+        import_status = ft.Text("", text_align=ft.TextAlign.CENTER, visible=False)
+
+        def pick_csv(e):
+            file_picker = ft.FilePicker(on_result=on_csv_picked)
+            page.overlay.append(file_picker)
+            page.update()
+            file_picker.pick_files(allowed_extensions=["csv"])
+
+        def on_csv_picked(result):
+            if not result.files:
+                return
+            path = result.files[0].path
+            import_progress.value = None
+            import_progress.visible = True
+            import_status.value = "جاري الاستيراد..."
+            import_status.visible = True
+            page.update()
+
+            def progress(count):
+                import_status.value = f"تمت معالجة {count} مستخدم"
+                page.update()
+
+            def on_imported(result):
+                import_progress.visible = False
+                if result is None:
+                    import_status.visible = False
+                elif result.errors:
+                    # أول الأخطاء برقم السطر في الملف
+                    shown = "\n".join(f"سطر {line}: {reason}" for line, reason in result.errors[:20])
+                    more = len(result.errors) - 20
+                    import_status.value = shown + (f"\n... و {more} أخطاء أخرى" if more > 0 else "")
+                else:
+                    import_status.visible = False
+                refresh_users(force=True)
+
+            run_in_background(
+                import_users, path, list(users_by_code), progress,
+                on_done=on_imported,
+            )
+
+        def build_user_row(u):
+            def on_delete(e):
+                def confirm_delete(e):
+                    page.dialog.open = False
                     page.update()
+                    run_in_background(
+                        delete_user, u.code,
+                        on_done=lambda ok: remove_users([u.code]) if ok else None,
+                    )
+
+                page.dialog = ft.AlertDialog(
+                    title=ft.Text("تأكيد الحذف", text_align=ft.TextAlign.CENTER),
+                    content=ft.Text("هل أنت متأكد من حذف هذا المستخدم؟", text_align=ft.TextAlign.CENTER),
+                    actions=[
+                        ft.TextButton("إلغاء", on_click=lambda e: setattr(page.dialog, "open", False)),
+                        ft.TextButton("حذف", on_click=confirm_delete, style=ft.ButtonStyle(color=ft.Colors.RED)),
+                    ],
+                    actions_alignment=ft.MainAxisAlignment.CENTER,
+                )
+                page.dialog.open = True
+                page.update()
 
-                controls.append(
-                    ft.Card(
-                        content=ft.Container(
-                            content=ft.ResponsiveRow(
-                                [
-                                    ft.Column(
-                                        col={"sm": 10, "md": 11},
-                                        controls=[
-                                            ft.Text(f"كود: {u.code}", weight=ft.FontWeight.BOLD, size=16),
-                                            ft.Text(f"الاسم: {u.username}", size=14, color=ft.Colors.SECONDARY),
-                                            ft.Text(f"القسم: {u.department}", size=14, color=ft.Colors.SECONDARY),
-                                            ft.Text(f"الشعبة: {u.division}", size=14, color=ft.Colors.SECONDARY),
-                                            ft.Text(f"الدور: {u.role}", size=14, color=ft.Colors.SECONDARY),
-                                        ],
-                                        alignment=ft.MainAxisAlignment.CENTER,
-                                        expand=True,
-                                    ),
-                                    ft.Column(
-                                        col={"sm": 2, "md": 1},
-                                        controls=[
-                                            ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, on_click=on_delete, tooltip="حذف")
-                                        ],
-                                        alignment=ft.MainAxisAlignment.CENTER,
-                                        horizontal_alignment=ft.CrossAxisAlignment.END,
-                                    ),
+            return ft.Card(
+                content=ft.Container(
+                    content=ft.ResponsiveRow(
+                        [
+                            ft.Column(
+                                col={"sm": 2, "md": 1},
+                                controls=[
+                                    ft.Checkbox(
+                                        value=u.code in selected_codes,
+                                        on_change=lambda e: on_select(e, u.code),
+                                    )
                                 ],
-                                alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                                alignment=ft.MainAxisAlignment.CENTER,
                             ),
-                            padding=16,
-                        ),
-                        elevation=3,
-                    )
-                )
-            return controls
+                            ft.Column(
+                                col={"sm": 8, "md": 10},
+                                controls=[
+                                    ft.Text(f"كود: {u.code}", weight=ft.FontWeight.BOLD, size=16),
+                                    ft.Text(f"الاسم: {u.username}", size=14, color=ft.Colors.SECONDARY),
+                                    ft.Text(f"القسم: {u.department}", size=14, color=ft.Colors.SECONDARY),
+                                    ft.Text(f"الشعبة: {u.division}", size=14, color=ft.Colors.SECONDARY),
+                                    ft.Text(f"الدور: {u.role}", size=14, color=ft.Colors.SECONDARY),
+                                ],
+                                alignment=ft.MainAxisAlignment.CENTER,
+                                expand=True,
+                            ),
+                            ft.Column(
+                                col={"sm": 2, "md": 1},
+                                controls=[
+                                    ft.IconButton(ft.Icons.DELETE, icon_color=ft.Colors.RED, on_click=on_delete, tooltip="حذف")
+                                ],
+                                alignment=ft.MainAxisAlignment.CENTER,
+                                horizontal_alignment=ft.CrossAxisAlignment.END,
+                            ),
+                        ],
+                        alignment=ft.MainAxisAlignment.SPACE_BETWEEN,
+                    ),
+                    padding=16,
+                ),
+                elevation=3,
+            )
+
+        user_list = ft.ListView(expand=True, spacing=10, padding=10)
+        # الصفوف تبنى عند ظهورها فقط حتى مع عشرات الآلاف من الحسابات
+        user_rows = VirtualList(
+            user_list,
+            build_user_row,
+            key=lambda u: u.code,
+            signature=lambda u: (u.username, u.department, u.division, u.role, u.code in selected_codes),
+            on_end_reached=lambda: run_in_background(load_more_users) if directory.has_more else None,
+        )
 
-        user_list = ft.ListView(controls=build_user_list(), expand=True, spacing=10, padding=10)
+        search_debouncer = Debouncer(0.3, filter_users)
+        search_field = ft.TextField(
+            label="بحث بالكود أو الاسم...",
+            on_change=lambda e: search_debouncer(),
+            width=300,
+            rtl=True,
+            border_radius=10,
+        )
+        filter_fields = [
+            (ft.Dropdown(label="القسم", width=160, options=[], on_change=lambda e: filter_users()), "department"),
+            (ft.Dropdown(label="الشعبة", width=160, options=[], on_change=lambda e: filter_users()), "division"),
+            (ft.Dropdown(label="الدور", width=160, options=[], on_change=lambda e: filter_users()), "role"),
+        ]
+        user_count = ft.Text(f"{len(users)} مستخدم", size=14, color=ft.Colors.SECONDARY)
 
         fields = {
             "code": ft.TextField(label="كود المستخدم"),
@@ -1054,25 +2160,54 @@ def main(page: ft.Page):
             if not all(field.value for field in fields.values()):
                 show_error("يرجى إدخال جميع الحقول")
                 return
-            if add_user(
+            def on_added(user):
+                if user:
+                    for field in fields.values():
+                        field.value = ""
+                    insert_user(user)
+
+            run_in_background(
+                add_user,
                 fields["code"].value,
                 fields["username"].value,
                 fields["department"].value,
                 fields["division"].value,
                 fields["role"].value,
                 fields["password"].value,
-            ):
-                for field in fields.values():
-                    field.value = ""
-                refresh_users(None)
+                on_done=on_added,
+            )
+
+        delete_selected_button = ft.ElevatedButton(
+            "حذف المحدد (0)",
+            icon=ft.Icons.DELETE_SWEEP,
+            on_click=delete_selected,
+            disabled=True,
+            style=ft.ButtonStyle(padding=15, color=ft.Colors.RED),
+        )
 
         form = ft.Column(
             controls=[field for field in fields.values()] + [
-                ft.ElevatedButton(
-                    "إضافة مستخدم",
-                    on_click=add_new_user,
-                    style=ft.ButtonStyle(padding=15),
-                )
+                ft.Row(
+                    [
+                        ft.ElevatedButton(
+                            "إضافة مستخدم",
+                            on_click=add_new_user,
+                            style=ft.ButtonStyle(padding=15),
+                        ),
+                        ft.ElevatedButton(
+                            "استيراد من CSV",
+                            icon=ft.Icons.UPLOAD_FILE,
+                            on_click=pick_csv,
+                            tooltip="الأعمدة: code, username, department, division, role, password",
+                            style=ft.ButtonStyle(padding=15),
+                        ),
+                        delete_selected_button,
+                    ],
+                    wrap=True,
+                    spacing=10,
+                ),
+                import_progress,
+                import_status,
             ],
             spacing=10,
         )
@@ -1088,6 +2223,11 @@ def main(page: ft.Page):
                         border_radius=12,
                         shadow=ft.BoxShadow(blur_radius=5, color=ft.Colors.BLACK12),
                     ),
+                    ft.Row(
+                        [search_field] + [dropdown for dropdown, field in filter_fields] + [user_count],
+                        wrap=True,
+                        spacing=10,
+                    ),
                     user_list,
                 ],
                 alignment=ft.MainAxisAlignment.START,
@@ -1108,20 +2248,39 @@ def main(page: ft.Page):
                 expand=True,
             )
         )
+        reset_directory(users)
         page.update()
+        refresh_users()
 
     @require_login
-    def show_image_viewer(url):
+    def show_image_viewer(item):
+        image_view = ft.Image(
+            src_base64="",
+            fit=ft.ImageFit.CONTAIN,
+            width=page.width - 40,
+            height=page.height - 100,
+            visible=False,
+        )
+        status_text = ft.Text("جاري تحميل الصورة...", text_align=ft.TextAlign.CENTER)
+
+        def load_image():
+            # الصورة تقرأ من الملف المحفوظ محلياً ولا تحمل من السيرفر إلا أول مرة
+            path = get_local_file(item)
+            if path:
+                with open(path, "rb") as f:
+                    image_view.src_base64 = base64.b64encode(f.read()).decode("ascii")
+                image_view.visible = True
+                status_text.visible = False
+            else:
+                status_text.value = "فشل في جلب الصورة"
+            page.update()
+
         main_content = ft.Container(
             content=ft.Column(
                 [
                     ft.Text("عرض الصورة", size=24, weight=ft.FontWeight.BOLD, text_align=ft.TextAlign.CENTER),
-                    ft.Image(
-                        src=url, 
-                        fit=ft.ImageFit.CONTAIN, 
-                        width=page.width - 40,
-                        height=page.height - 100,
-                    ),
+                    status_text,
+                    image_view,
                 ],
                 alignment=ft.MainAxisAlignment.CENTER,
             ),
@@ -1141,24 +2300,138 @@ def main(page: ft.Page):
             )
         )
         page.update()
+        run_in_background(load_image)
 
     @require_login
-    def show_text_viewer(url):
-        try:
-            response = requests.get(url, timeout=10)
-            if response.status_code == 200:
-                content = response.text
+    def show_text_viewer(item):
+        nonlocal view_cancel
+        view_cancel.set()
+        cancel = view_cancel = threading.Event()
+        # النص يقسم إلى صفحات أثناء التحميل ولا يبنى منها إلا ما يقترب من الظهور
+        document = PagedText()
+        status_text = ft.Text("جاري تحميل النص...", size=14, color=ft.Colors.SECONDARY)
+        matches_text = ft.Text("", size=14, color=ft.Colors.SECONDARY)
+        text_list = ft.ListView(expand=True, padding=20)
+        search_query = ""
+        matches = []
+        match_pages = set()
+        match_position = -1
+
+        def build_page(index):
+            lines = document.pages[index]
+            if index not in match_pages:
+                return ft.Text("\n".join(lines), selectable=True, rtl=True, key=f"page-{index}")
+            hits = {line for page_index, line in matches if page_index == index}
+            highlight = ft.TextStyle(bgcolor=ft.Colors.YELLOW_200)
+            return ft.Text(
+                spans=[
+                    ft.TextSpan(line + "\n", style=highlight if number in hits else None)
+                    for number, line in enumerate(lines)
+                ],
+                selectable=True,
+                rtl=True,
+                key=f"page-{index}",
+            )
+
+        text_pages = VirtualList(
+            text_list,
+            build_page,
+            key=lambda index: index,
+            signature=lambda index: (search_query, index in match_pages),
+            window=5,
+            threshold=800,
+        )
+
+        def update_matches_text():
+            if not search_query:
+                matches_text.value = ""
+            elif not matches:
+                matches_text.value = "لا توجد نتائج"
             else:
-                content = "فشل في جلب النص"
-        except Exception as e:
-            content = f"خطأ: {e}"
+                matches_text.value = f"{match_position + 1} / {len(matches)}"
+
+        def add_pages(new_pages):
+            if not new_pages:
+                return
+            if search_query:
+                found = document.search(search_query, new_pages)
+                matches.extend(found)
+                match_pages.update(page_index for page_index, line in found)
+                update_matches_text()
+            text_pages.set_items(range(len(document.pages)))
+            page.update()
+
+        def load_text():
+            try:
+                stream = blob_cache.stream(
+                    BlobCache.key_for(item.id, item.file_path),
+                    FILES_URL + item.file_path,
+                    api,
+                    suffix=f".{item.file_type}",
+                    cancel=cancel,
+                )
+                for chunk in stream:
+                    add_pages(document.feed(chunk))
+                add_pages(document.finish())
+                status_text.visible = False
+            except FetchCancelled:
+                return
+            except Exception as e:
+                status_text.value = "فشل في جلب النص"
+            page.update()
+
+        def go_to_match(step):
+            nonlocal match_position
+            if not matches:
+                return
+            match_position = (match_position + step) % len(matches)
+            page_index = matches[match_position][0]
+            # بناء صفحة النتيجة (وما قبلها) قبل التمرير إليها
+            text_pages.reveal(page_index)
+            update_matches_text()
+            page.update()
+            text_list.scroll_to(key=f"page-{page_index}", duration=300)
+
+        def run_search(e):
+            nonlocal search_query, matches, match_position
+            search_query = search_field.value.strip()
+            # البحث في الصفحات المحملة حتى الآن، والصفحات التالية تبحث عند وصولها
+            matches = document.search(search_query)
+            match_pages.clear()
+            match_pages.update(page_index for page_index, line in matches)
+            match_position = -1
+            text_pages.set_items(range(len(document.pages)))
+            if matches:
+                go_to_match(1)
+            else:
+                update_matches_text()
+                page.update()
+
+        search_field = ft.TextField(
+            label="بحث في النص",
+            prefix_icon=ft.Icons.SEARCH,
+            border_radius=15,
+            filled=True,
+            text_align=ft.TextAlign.RIGHT,
+            on_submit=run_search,
+            expand=True,
+        )
 
         main_content = ft.Container(
             content=ft.Column(
                 [
                     ft.Text("عرض النص", size=24, weight=ft.FontWeight.BOLD, text_align=ft.TextAlign.CENTER),
+                    ft.Row(
+                        [
+                            search_field,
+                            matches_text,
+                            ft.IconButton(ft.Icons.ARROW_UPWARD, on_click=lambda e: go_to_match(-1), tooltip="السابق"),
+                            ft.IconButton(ft.Icons.ARROW_DOWNWARD, on_click=lambda e: go_to_match(1), tooltip="التالي"),
+                        ],
+                    ),
+                    status_text,
                     ft.Container(
-                        content=ft.Text(content, selectable=True, rtl=True),
+                        content=text_list,
                         padding=20,
                         border_radius=10,
                         bgcolor=page.theme.color_scheme.surface,
@@ -1184,6 +2457,7 @@ def main(page: ft.Page):
             )
         )
         page.update()
+        run_in_background(load_text)
 
     @require_login
     def show_home():
@@ -1243,15 +2517,58 @@ def main(page: ft.Page):
         )
         page.update()
 
-    # بدء التطبيق
+    def load_fonts():
+        """تسجيل الخط بعد ظهور أول شاشة (حتى ذلك الحين يستخدم خط النظام)
+
+        الأولوية للخط المضمن في assets، ثم نسخة محملة مرة واحدة في مجلد بيانات التطبيق
+        (مجلد assets للقراءة فقط في النسخ المغلفة). في الويب يحمله المتصفح من الرابط مباشرة.
+        """
+        if os.path.exists(os.path.join(ASSETS_DIR, FONT_FILE)):
+            font = FONT_FILE
+        elif page.web:
+            font = FONT_URL
+        else:
+            font = os.path.join(app_data_dir("fonts"), os.path.basename(FONT_FILE))
+            if not os.path.exists(font):
+                try:
+                    response = api.get(FONT_URL, endpoint="file")
+                    response.raise_for_status()
+                    with open(font + ".tmp", "wb") as f:
+                        f.write(response.content)
+                    os.replace(font + ".tmp", font)
+                except Exception as e:
+                    logger.warning("font download failed: %s", e)
+                    return
+        page.fonts = {"Cairo": font, "Cairo-Bold": font}
+        page.update()
+
+    def after_first_screen(restored):
+        logger.info(
+            "first screen (%s) after %.0f ms",
+            "restored session" if restored else "login",
+            (time.perf_counter() - STARTED_AT) * 1000,
+        )
+        run_in_background(load_fonts)
+        run_in_background(set_arabic_locale)
+
+    # بدء التطبيق: استعادة الجلسة المحفوظة تعرض الرئيسية مباشرة دون انتظار السيرفر
+    restored = False
     user_data = page.client_storage.get("user")
     if user_data:
         try:
             page.user = User.from_json(json.loads(user_data))
             show_home()
+            restored = True
+            warm_up()
+            run_in_background(verify_session)
         except:
+            page.user = None
             login_screen()
     else:
         login_screen()
+    after_first_screen(restored)
+
 
-ft.app(target=main)
+if __name__ == "__main__":
+    configure_logging()
+    ft.app(target=main, assets_dir="assets")
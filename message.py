@@ -1,4 +1,14 @@
+import logging
+
+from dates import parse_datetime
+
+logger = logging.getLogger("alson")
+
+
 class Message:
+    # بدون __dict__ لكل رسالة: الشات يخزن آلاف الرسائل في الذاكرة
+    __slots__ = ("id", "content", "sender_id", "username", "department", "division", "timestamp")
+
     def __init__(self, id, content, sender_id, username, department, division, timestamp):
         self.id = id
         self.content = content
@@ -9,7 +19,8 @@ class Message:
         self.timestamp = timestamp
 
     @classmethod
-    def from_json(cls, data):
+    def from_json(cls, data, parse_dates=False):
+        timestamp = data['timestamp']
         return cls(
             data['id'],
             data['content'],
@@ -17,5 +28,26 @@ class Message:
             data['username'],
             data.get('department', ''),
             data.get('division', ''),
-            data['timestamp']
-        )
\ No newline at end of file
+            parse_datetime(timestamp) if parse_dates else timestamp,
+        )
+
+    @classmethod
+    def from_json_list(cls, items, parse_dates=False):
+        """تحويل قائمة كاملة في مرور واحد مع تجاهل السجلات الناقصة"""
+        result = []
+        append = result.append
+        from_json = cls.from_json
+        for data in items:
+            try:
+                append(from_json(data, parse_dates))
+            except (KeyError, TypeError, AttributeError):
+                logger.warning("تجاهل رسالة غير صالحة: %r", data)
+        return result
+
+    @property
+    def cursor(self):
+        # المعرف رقمي (ملي ثانية) ويستخدم كمؤشر للمزامنة التدريجية
+        try:
+            return int(self.id)
+        except (TypeError, ValueError):
+            return 0
@@ -0,0 +1,430 @@
+"""سيرفر محلي بديل لـ api.php (الرسائل والمحتوى) و upload.php للقياس والتجربة دون اتصال
+
+التشغيل كسيرفر:     python mock_server.py --serve --port 8765
+ثم:                 ALSON_API_URL=http://127.0.0.1:8765/api python main.py
+قياس طرق النقل:     python mock_server.py --duration 30
+"""
+import argparse
+import hashlib
+import json
+import threading
+import uuid
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+class MockApiServer:
+    def __init__(self, host="127.0.0.1", port=0, chunk_failures=0):
+        self.messages = []
+        self.content = []
+        self.uploads = {}
+        self.users = []
+        # رموز الجلسات: الرمز → (كود المستخدم، وقت انتهاء الصلاحية)
+        self.tokens = {}
+        self.token_ttl = 3600
+        # عدد طلبات الأجزاء الأولى التي تفشل عمداً لتجربة إعادة المحاولة
+        self.chunk_failures = chunk_failures
+        self.requests = {}
+        self.condition = threading.Condition()
+        self.running = True
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    @property
+    def request_count(self):
+        return sum(self.requests.values())
+
+    def count(self, kind):
+        with self.condition:
+            self.requests[kind] = self.requests.get(kind, 0) + 1
+
+    def add_message(self, content, sender_id="0", username="mock", department="", division="", id=None):
+        with self.condition:
+            last = max((int(m["id"]) for m in self.messages), default=0)
+            message = {
+                "id": str(id or max(int(time.time() * 1000), last + 1)),
+                "content": content,
+                "sender_id": sender_id,
+                "username": username,
+                "department": department,
+                "division": division,
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            if not any(m["id"] == message["id"] for m in self.messages):
+                self.messages.append(message)
+            self.condition.notify_all()
+            return message
+
+    def add_content(self, title, file_path, file_type, uploaded_by="", department="", division="", description="", size=0):
+        with self.condition:
+            item = {
+                "id": str(len(self.content) + 1),
+                "title": title,
+                "file_path": file_path,
+                "file_type": file_type,
+                "uploaded_by": uploaded_by,
+                "department": department,
+                "division": division,
+                "upload_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "description": description,
+                "file_size": size,
+            }
+            self.content.append(item)
+            return item
+
+    def add_user(self, code, password, username="", department="", division="", role="student"):
+        with self.condition:
+            user = {
+                "code": code,
+                "password": password,
+                "username": username or code,
+                "department": department,
+                "division": division,
+                "role": role,
+            }
+            self.users.append(user)
+            return user
+
+    def issue_token(self, code):
+        token = uuid.uuid4().hex
+        self.tokens[token] = (code, time.time() + self.token_ttl)
+        return {"token": token, "refresh_token": uuid.uuid4().hex, "expires_in": self.token_ttl}
+
+    def token_user(self, authorization):
+        token = (authorization or "").replace("Bearer ", "", 1)
+        code, expires_at = self.tokens.get(token, (None, 0))
+        if expires_at < time.time():
+            return None, token
+        return next((u for u in self.users if u["code"] == code), None), token
+
+    def public_user(self, user):
+        return {k: v for k, v in user.items() if k != "password"}
+
+    def find_content(self, department, division):
+        return [
+            c for c in self.content
+            if (not department or c["department"] == department)
+            and (not division or c["division"] == division)
+        ]
+
+    def find_messages(self, department, division, since):
+        return [
+            m for m in self.messages
+            if (not department or m["department"] == department)
+            and (not division or m["division"] == division)
+            and int(m["id"]) > since
+        ]
+
+    def wait_for_messages(self, department, division, since, timeout):
+        deadline = time.monotonic() + timeout
+        with self.condition:
+            while self.running:
+                found = self.find_messages(department, division, since)
+                remaining = deadline - time.monotonic()
+                if found or remaining <= 0:
+                    return found
+                self.condition.wait(remaining)
+            return []
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, data, status=200, headers=None):
+                body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def read_json(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def route(self):
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                return parsed.path, query
+
+            def do_GET(self):
+                path, query = self.route()
+                if path == "/stats":
+                    return self.send_json(server.requests)
+                if path == "/api/api.php" and query.get("table") == "content":
+                    return self.list_content(query)
+                if path == "/api/api.php" and query.get("table") == "users" and query.get("action") == "all":
+                    server.count("all")
+                    with server.condition:
+                        found = [server.public_user(u) for u in server.users]
+                    offset = int(query.get("offset") or 0)
+                    if query.get("limit"):
+                        found = found[offset:offset + int(query["limit"])]
+                    return self.send_json(found)
+                if path == "/api/api.php" and query.get("table") == "users" and query.get("action") == "me":
+                    server.count("me")
+                    with server.condition:
+                        user, token = server.token_user(self.headers.get("Authorization"))
+                    if user is None:
+                        return self.send_json({"error": "invalid token"}, 401)
+                    return self.send_json(server.public_user(user))
+                if path != "/api/api.php" or query.get("table") != "messages":
+                    return self.send_json({"error": "not found"}, 404)
+
+                department = query.get("department", "")
+                division = query.get("division", "")
+                since = int(query.get("since") or 0)
+                if query.get("stream") == "sse":
+                    server.count("sse")
+                    return self.stream(department, division, since)
+                if "wait" in query:
+                    server.count("long-poll")
+                    found = server.wait_for_messages(department, division, since, float(query["wait"]))
+                    return self.send_json(found, headers={"X-Long-Poll": "1"})
+                server.count("polling")
+                with server.condition:
+                    found = server.find_messages(department, division, since)
+                if query.get("before"):
+                    found = [m for m in found if int(m["id"]) < int(query["before"])]
+                if query.get("limit"):
+                    # أحدث limit رسالة بترتيب تصاعدي
+                    found = found[-int(query["limit"]):]
+                self.send_json(found)
+
+            def list_content(self, query):
+                server.count("content")
+                with server.condition:
+                    found = server.find_content(query.get("department", ""), query.get("division", ""))
+                offset = int(query.get("offset") or 0)
+                if query.get("limit"):
+                    found = found[offset:offset + int(query["limit"])]
+                body = json.dumps(found, ensure_ascii=False).encode("utf-8")
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                self.send_json(found, headers={"ETag": etag})
+
+            def stream(self, department, division, since):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                try:
+                    while server.running:
+                        found = server.wait_for_messages(department, division, since, 15)
+                        if found:
+                            since = max(int(m["id"]) for m in found)
+                            payload = json.dumps(found, ensure_ascii=False)
+                            self.wfile.write(f"data: {payload}\n\n".encode("utf-8"))
+                        else:
+                            self.wfile.write(b": keepalive\n\n")
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def upload(self, query):
+                action = query.get("action")
+                server.count(f"upload-{action}")
+                if action == "init":
+                    meta = self.read_json()
+                    upload_id = uuid.uuid4().hex
+                    with server.condition:
+                        server.uploads[upload_id] = {"meta": meta, "data": bytearray()}
+                    return self.send_json({"upload_id": upload_id, "received": 0})
+
+                upload = server.uploads.get(query.get("upload_id"))
+                if upload is None:
+                    return self.send_json({"error": "unknown upload"}, 404)
+                if action == "status":
+                    return self.send_json({"received": len(upload["data"])})
+                if action == "chunk":
+                    length = int(self.headers.get("Content-Length") or 0)
+                    chunk = self.rfile.read(length)
+                    with server.condition:
+                        if server.chunk_failures > 0:
+                            server.chunk_failures -= 1
+                            return self.send_json({"error": "temporary failure"}, 503)
+                        if int(query.get("offset", 0)) != len(upload["data"]):
+                            return self.send_json({"received": len(upload["data"])}, 409)
+                        upload["data"].extend(chunk)
+                    return self.send_json({"received": len(upload["data"])})
+                if action == "complete":
+                    meta = upload["meta"]
+                    filename = meta.get("filename", "file")
+                    item = server.add_content(
+                        meta.get("title", filename),
+                        f"uploads/{filename}",
+                        filename.rsplit(".", 1)[-1].lower(),
+                        uploaded_by=meta.get("uploaded_by", ""),
+                        department=meta.get("department", ""),
+                        division=meta.get("division", ""),
+                        description=meta.get("description", ""),
+                        size=len(upload["data"]),
+                    )
+                    with server.condition:
+                        server.uploads.pop(query["upload_id"], None)
+                    return self.send_json(item)
+                self.send_json({"error": "unknown action"}, 400)
+
+            def do_POST(self):
+                path, query = self.route()
+                if path == "/api/upload.php":
+                    return self.upload(query)
+                if path == "/api/api.php" and query.get("table") == "users":
+                    return self.users(query)
+                if path != "/api/api.php" or query.get("table") != "messages":
+                    return self.send_json({"error": "not found"}, 404)
+                server.count("send")
+                data = self.read_json()
+                message = server.add_message(
+                    data.get("content", ""),
+                    sender_id=data.get("sender_id", ""),
+                    username=data.get("sender_id", ""),
+                    department=data.get("department", ""),
+                    division=data.get("division", ""),
+                    id=data.get("id"),
+                )
+                self.send_json(message)
+
+            def users(self, query):
+                action = query.get("action")
+                server.count(action or "users")
+                data = self.read_json()
+                with server.condition:
+                    if action == "login":
+                        user = next(
+                            (u for u in server.users if u["code"] == data.get("code") and u["password"] == data.get("password")),
+                            None,
+                        )
+                        if user is None:
+                            return self.send_json({"error": "كود المستخدم أو كلمة المرور غير صحيحة"}, 401)
+                        return self.send_json({**server.public_user(user), **server.issue_token(user["code"])})
+                    if action == "refresh":
+                        user, token = server.token_user(self.headers.get("Authorization"))
+                        if user is None:
+                            return self.send_json({"error": "invalid token"}, 401)
+                        del server.tokens[token]
+                        return self.send_json(server.issue_token(user["code"]))
+                    if action == "add":
+                        if any(u["code"] == data.get("code") for u in server.users):
+                            return self.send_json({"error": "الكود مستخدم من قبل"}, 409)
+                        return self.send_json(server.public_user(server.add_user(**data)))
+                    if action == "add_batch":
+                        errors = []
+                        for record in data.get("users", []):
+                            if any(u["code"] == record.get("code") for u in server.users):
+                                errors.append({"code": record.get("code"), "error": "الكود مستخدم من قبل"})
+                            else:
+                                server.add_user(**record)
+                        return self.send_json({"errors": errors})
+                return self.send_json({"error": "not found"}, 404)
+
+            def do_DELETE(self):
+                path, query = self.route()
+                if path != "/api/api.php" or query.get("table") != "users":
+                    return self.send_json({"error": "not found"}, 404)
+                server.count("delete")
+                data = self.read_json()
+                codes = set(data.get("codes", [])) if query.get("action") == "delete_batch" else {data.get("code")}
+                with server.condition:
+                    deleted = sorted(u["code"] for u in server.users if u["code"] in codes)
+                    server.users = [u for u in server.users if u["code"] not in codes]
+                self.send_json({"deleted": deleted})
+
+        return Handler
+
+
+def measure(mode, duration, every, poll_interval):
+    """يقيس متوسط زمن وصول الرسائل وعدد الطلبات لطريقة نقل واحدة"""
+    from api_client import ApiClient
+    from chat_transport import FallbackTransport, LongPollTransport, PollingTransport, SseTransport
+
+    server = MockApiServer().start()
+    api = ApiClient(server.url)
+    polling = PollingTransport(api, interval=poll_interval)
+    transport = {
+        "polling": polling,
+        "long-poll": FallbackTransport(LongPollTransport(api, wait_seconds=10), polling),
+        "sse": FallbackTransport(SseTransport(api), polling),
+    }[mode]
+
+    sent_at = {}
+    latencies = []
+    stop = threading.Event()
+
+    def client():
+        since = 0
+        while not stop.wait(transport.interval):
+            try:
+                items = transport.wait("", "", since)
+            except Exception:
+                continue
+            now = time.monotonic()
+            for item in items:
+                since = max(since, int(item["id"]))
+                if item["id"] in sent_at:
+                    latencies.append(now - sent_at.pop(item["id"]))
+
+    thread = threading.Thread(target=client, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        time.sleep(every)
+        message = server.add_message("ping")
+        sent_at[message["id"]] = time.monotonic()
+    time.sleep(min(poll_interval, 2) + 0.5)
+    stop.set()
+    transport.close()
+    server.stop()
+
+    average = sum(latencies) / len(latencies) if latencies else float("nan")
+    print(f"{mode:<10} requests={server.request_count:<4} delivered={len(latencies):<3} avg_latency={average:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--serve", action="store_true", help="تشغيل السيرفر فقط")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--duration", type=float, default=30, help="مدة القياس لكل طريقة نقل")
+    parser.add_argument("--every", type=float, default=3, help="الفاصل بين الرسائل المحقونة")
+    parser.add_argument("--poll-interval", type=float, default=10)
+    args = parser.parse_args()
+
+    if args.serve:
+        mock = MockApiServer(port=args.port).start()
+        print(f"Mock API on {mock.url}")
+        try:
+            mock.thread.join()
+        except KeyboardInterrupt:
+            mock.stop()
+    else:
+        for mode in ("polling", "long-poll", "sse"):
+            measure(mode, args.duration, args.every, args.poll_interval)
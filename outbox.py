@@ -0,0 +1,167 @@
+import json
+import os
+import sqlite3
+import threading
+
+from storage import app_data_dir
+
+
+class PermanentSendError(Exception):
+    """رفض السيرفر الرسالة نهائياً (لا فائدة من إعادة المحاولة)"""
+
+
+class ChatOutbox:
+    """رسائل الشات المنتظرة للإرسال في SQLite، يرسلها خيط في الخلفية بالترتيب مع إعادة المحاولة
+
+    send(payload) ترسل رسالة واحدة وترمي استثناء عند الفشل (PermanentSendError لإسقاطها).
+    المعرف id في الرسالة يمنع تكرارها في الطابور، ويعتمد عليه السيرفر لتجاهل الإرسال المكرر.
+    الملف مشترك بين الصفحات، فكل صندوق يعرض ويرسل رسائل مستخدمه فقط (sender_id الممرر إلى start).
+    """
+
+    # الرسائل التي يرسلها صندوق الآن، حتى لا ترسلها صفحة أخرى لنفس المستخدم في نفس الوقت
+    _sending = set()
+    _sending_lock = threading.Lock()
+
+    def __init__(self, send, path=None, backoff=1.0, max_backoff=60, on_sent=None, on_failed=None):
+        self.send = send
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.on_sent = on_sent
+        self.on_failed = on_failed
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.sender_id = None
+        self._db = sqlite3.connect(path or os.path.join(app_data_dir(), "outbox.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " id TEXT NOT NULL UNIQUE,"
+            " sender_id TEXT NOT NULL DEFAULT '',"
+            " payload TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        # ملفات الإصدارات السابقة بدون عمود المرسل
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(outbox)")]
+        if "sender_id" not in columns:
+            self._db.execute("ALTER TABLE outbox ADD COLUMN sender_id TEXT NOT NULL DEFAULT ''")
+        self._db.commit()
+
+    def add(self, payload):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO outbox (id, sender_id, payload) VALUES (?, ?, ?)",
+                (payload["id"], str(payload["sender_id"]), json.dumps(payload, ensure_ascii=False)),
+            )
+            self._db.commit()
+        self._wake.set()
+        return payload
+
+    def pending(self, department=None, division=None):
+        """رسائل المستخدم الحالي التي لم ترسل بعد بترتيب إضافتها"""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT payload FROM outbox WHERE sender_id = ? ORDER BY seq", (str(self.sender_id),)
+            ).fetchall()
+        payloads = [json.loads(row[0]) for row in rows]
+        return [
+            p for p in payloads
+            if (department is None or p.get("department") == department)
+            and (division is None or p.get("division") == division)
+        ]
+
+    def _head(self):
+        sender_id = self.sender_id
+        if sender_id is None:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, payload, attempts FROM outbox WHERE sender_id = ? ORDER BY seq LIMIT 1", (str(sender_id),)
+            ).fetchone()
+        return (row[0], json.loads(row[1]), row[2]) if row else None
+
+    def _claim(self, id):
+        with self._sending_lock:
+            if id in self._sending:
+                return False
+            # قد تكون صفحة أخرى أرسلتها وحذفتها بعد قراءتها هنا
+            with self._lock:
+                if self._db.execute("SELECT 1 FROM outbox WHERE id = ?", (id,)).fetchone() is None:
+                    return False
+            self._sending.add(id)
+            return True
+
+    @classmethod
+    def _release(cls, id):
+        with cls._sending_lock:
+            cls._sending.discard(id)
+
+    def _remove(self, id):
+        with self._lock:
+            self._db.execute("DELETE FROM outbox WHERE id = ?", (id,))
+            self._db.commit()
+
+    def _failed_attempt(self, id):
+        with self._lock:
+            self._db.execute("UPDATE outbox SET attempts = attempts + 1 WHERE id = ?", (id,))
+            self._db.commit()
+
+    def _run(self):
+        while not self._stop.is_set():
+            head = self._head()
+            if head is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            id, payload, attempts = head
+            if not self._claim(id):
+                # صفحة أخرى لنفس المستخدم ترسلها الآن؛ الترتيب يمنع إرسال ما بعدها قبلها
+                self._wake.wait(self.backoff)
+                self._wake.clear()
+                continue
+            try:
+                self.send(payload)
+            except PermanentSendError as e:
+                self._remove(id)
+                if self.on_failed:
+                    self.on_failed(payload, e)
+                continue
+            except Exception:
+                self._failed_attempt(id)
+                # الانتظار يقطع عند إضافة رسالة جديدة (غالباً عاد الاتصال)
+                self._wake.wait(min(self.backoff * (2 ** attempts), self.max_backoff))
+                self._wake.clear()
+                continue
+            else:
+                self._remove(id)
+            finally:
+                self._release(id)
+            if self.on_sent:
+                self.on_sent(payload)
+
+    def start(self, sender_id=None):
+        """بدء إرسال رسائل المستخدم sender_id (أو متابعتها بعد تسجيل دخول جديد)"""
+        self.sender_id = sender_id
+        self._wake.set()
+        if self._thread and self._thread.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="chat-outbox", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def flush_now(self):
+        """إعادة المحاولة فوراً بدلاً من انتظار انتهاء مهلة التأجيل"""
+        self._wake.set()
+
+    def clear(self):
+        """حذف رسائل المستخدم الحالي وإيقاف إرسالها حتى start التالية"""
+        sender_id, self.sender_id = self.sender_id, None
+        with self._lock:
+            self._db.execute("DELETE FROM outbox WHERE sender_id = ?", (str(sender_id),))
+            self._db.commit()
@@ -0,0 +1,68 @@
+import codecs
+import zlib
+
+from search_index import normalize
+
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class PagedText:
+    """نص طويل يصل على أجزاء ويقسم إلى صفحات من الأسطر، للعرض والبحث دون تحميله في عنصر واحد
+
+    feed(bytes) و finish() تعيدان أرقام الصفحات التي اكتملت.
+    """
+
+    def __init__(self, lines_per_page=200, encoding="utf-8-sig"):
+        self.lines_per_page = lines_per_page
+        self.pages = []
+        self.finished = False
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._inflate = None
+        self._started = False
+        self._tail = ""
+        self._lines = []
+
+    def feed(self, data):
+        if not self._started:
+            self._started = True
+            # النصوص المرفوعة مضغوطة قد تصل كما هي إذا لم يرسل السيرفر Content-Encoding
+            if data.startswith(_GZIP_MAGIC):
+                self._inflate = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        if self._inflate is not None:
+            data = self._inflate.decompress(data)
+        return self._add_text(self._decoder.decode(data))
+
+    def finish(self):
+        data = self._inflate.flush() if self._inflate is not None else b""
+        text = self._decoder.decode(data, final=True)
+        new_pages = self._add_text(text)
+        if self._tail:
+            self._lines.append(self._tail.rstrip("\r"))
+            self._tail = ""
+        self.finished = True
+        return range(new_pages.start, self._flush(final=True).stop)
+
+    def _add_text(self, text):
+        lines = (self._tail + text).split("\n")
+        self._tail = lines.pop()
+        self._lines.extend(line.rstrip("\r") for line in lines)
+        return self._flush(final=False)
+
+    def _flush(self, final):
+        start = len(self.pages)
+        while len(self._lines) >= self.lines_per_page or (final and self._lines):
+            self.pages.append(self._lines[:self.lines_per_page])
+            self._lines = self._lines[self.lines_per_page:]
+        return range(start, len(self.pages))
+
+    def search(self, query, pages=None):
+        """مواضع (رقم الصفحة، رقم السطر) للأسطر التي تحتوي الاستعلام، مع توحيد النص العربي"""
+        needle = normalize(query).strip()
+        if not needle:
+            return []
+        matches = []
+        for index in pages if pages is not None else range(len(self.pages)):
+            for line_number, line in enumerate(self.pages[index]):
+                if needle in normalize(line):
+                    matches.append((index, line_number))
+        return matches
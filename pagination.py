@@ -0,0 +1,66 @@
+import threading
+
+
+class Pager:
+    """تحميل صفحات متتالية من السيرفر عند الحاجة (بالإزاحة أو بمؤشر)
+
+    fetch_page(cursor, limit) تعيد قائمة العناصر أو None عند الفشل،
+    و next_cursor(items) تحسب مؤشر الصفحة التالية من العناصر المحملة.
+    """
+
+    def __init__(self, fetch_page, key, next_cursor, page_size=50, items=None):
+        self.fetch_page = fetch_page
+        self.key = key
+        self.next_cursor = next_cursor
+        self.page_size = page_size
+        self.loading = False
+        self._lock = threading.Lock()
+        self.reset(items or [])
+
+    def reset(self, items):
+        self.items = list(items)
+        self._seen = {self.key(item) for item in self.items}
+        # عناصر أضيفت محلياً ولم تصل بعد في صفحة من السيرفر (لا تحسب في مؤشر الصفحة التالية)
+        self._added = set()
+        # أقل من صفحة كاملة يعني عدم وجود المزيد
+        self.exhausted = len(self.items) < self.page_size
+
+    @property
+    def has_more(self):
+        return not self.exhausted and not self.loading
+
+    def load_next(self):
+        with self._lock:
+            if not self.has_more:
+                return []
+            self.loading = True
+        try:
+            loaded = [item for item in self.items if self.key(item) not in self._added] if self._added else self.items
+            page = self.fetch_page(self.next_cursor(loaded), self.page_size)
+        finally:
+            self.loading = False
+        if page is None:
+            return []
+        self._added.difference_update(self.key(item) for item in page)
+        new_items = [item for item in page if self.key(item) not in self._seen]
+        self._seen.update(self.key(item) for item in new_items)
+        self.items.extend(new_items)
+        # صفحة ناقصة تعني النهاية، وصفحة أكبر من الحد تعني أن السيرفر أعاد كل شيء
+        if len(page) != self.page_size or not new_items:
+            self.exhausted = True
+        return new_items
+
+    def add(self, items):
+        """إضافة عناصر أنشئت محلياً دون أن تتكرر أو تزيح مؤشر الصفحة التالية"""
+        new_items = [item for item in items if self.key(item) not in self._seen]
+        self._seen.update(self.key(item) for item in new_items)
+        self._added.update(self.key(item) for item in new_items)
+        self.items.extend(new_items)
+        return new_items
+
+    def remove(self, keys):
+        """حذف عناصر حذفت من السيرفر؛ الإزاحة len(items) تبقى صحيحة لأن السيرفر نقص بنفس العدد"""
+        keys = set(keys)
+        self.items = [item for item in self.items if self.key(item) not in keys]
+        self._seen.difference_update(keys)
+        self._added.difference_update(keys)
@@ -0,0 +1,128 @@
+import base64
+import gzip
+import hashlib
+import io
+import os
+import shutil
+
+from storage import app_data_dir
+
+IMAGE_TYPES = ("jpg", "jpeg", "png")
+
+
+class PreparedUpload:
+    """الملف الجاهز للرفع بعد الضغط، مع الحقول الإضافية ونسبة التوفير"""
+
+    def __init__(self, original_path, path, fields=None, legacy_path=None, work_dir=None):
+        self.original_path = original_path
+        self.path = path
+        self.fields = fields or {}
+        # الملف المستخدم مع الرفع التقليدي (السيرفر القديم لا يفك ضغط gzip)
+        self.legacy_path = legacy_path or path
+        self.work_dir = work_dir
+        self.original_size = os.path.getsize(original_path)
+        self.size = os.path.getsize(path)
+
+    @property
+    def saved_bytes(self):
+        return max(self.original_size - self.size, 0)
+
+    @property
+    def saved_ratio(self):
+        return self.saved_bytes / self.original_size if self.original_size else 0.0
+
+    def cleanup(self):
+        if self.work_dir:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+def _work_dir(file_path, settings):
+    # مجلد ثابت لنفس الملف ونفس الإعدادات حتى يعمل استئناف الرفع على نفس الملف المضغوط
+    stat = os.stat(file_path)
+    digest = hashlib.sha1(
+        f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime}|{settings}".encode("utf-8")
+    ).hexdigest()
+    return app_data_dir("prepared", digest)
+
+
+def _thumbnail_bytes(image, size):
+    preview = image.copy()
+    preview.thumbnail((size, size))
+    buffer = io.BytesIO()
+    preview.convert("RGB").save(buffer, format="JPEG", quality=70)
+    return buffer.getvalue()
+
+
+def make_thumbnail(file_path, size=128):
+    """صورة مصغرة JPEG من ملف صورة (مسار أو ملف مفتوح)، أو None إذا لم يكن Pillow مثبتاً أو تعذرت قراءة الصورة"""
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        return None
+    try:
+        with Image.open(file_path) as image:
+            return _thumbnail_bytes(ImageOps.exif_transpose(image), size)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def _prepare_image(file_path, target, file_type, max_dimension, quality, thumbnail_size):
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        # Pillow غير مثبت: رفع الصورة كما هي
+        return None
+
+    try:
+        with Image.open(file_path) as image:
+            image = ImageOps.exif_transpose(image)
+            if max(image.size) > max_dimension:
+                image.thumbnail((max_dimension, max_dimension))
+            if file_type == "png":
+                image.save(target, format="PNG", optimize=True)
+            else:
+                image.convert("RGB").save(target, format="JPEG", quality=quality, optimize=True, progressive=True)
+
+            preview = _thumbnail_bytes(image, thumbnail_size)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        # صورة لا يستطيع Pillow قراءتها (تالفة أو ناقصة أو ضخمة جداً): ترفع كما هي
+        return None
+    return base64.b64encode(preview).decode("ascii")
+
+
+def prepare_upload(file_path, max_dimension=1600, quality=80, thumbnail_size=256, compress_text=True):
+    """تصغير الصور وإعادة ترميزها مع صورة مصغرة، وضغط النصوص بـ gzip قبل الرفع"""
+    file_type = os.path.splitext(file_path)[1].lstrip(".").lower()
+    settings = f"{max_dimension}|{quality}|{thumbnail_size}|{compress_text}"
+
+    if file_type in IMAGE_TYPES:
+        work_dir = _work_dir(file_path, settings)
+        target = os.path.join(work_dir, os.path.basename(file_path))
+        thumbnail_path = os.path.join(work_dir, "thumbnail.b64")
+        if os.path.exists(target) and os.path.exists(thumbnail_path):
+            with open(thumbnail_path, "r", encoding="ascii") as f:
+                thumbnail = f.read()
+        else:
+            thumbnail = _prepare_image(file_path, target, file_type, max_dimension, quality, thumbnail_size)
+            if thumbnail is None:
+                shutil.rmtree(work_dir, ignore_errors=True)
+                return PreparedUpload(file_path, file_path)
+            if os.path.getsize(target) >= os.path.getsize(file_path):
+                # إعادة الترميز لم تصغر الملف: نرفع الأصل مع الصورة المصغرة فقط
+                shutil.copyfile(file_path, target)
+            with open(thumbnail_path, "w", encoding="ascii") as f:
+                f.write(thumbnail)
+        return PreparedUpload(file_path, target, {"thumbnail": thumbnail}, work_dir=work_dir)
+
+    if file_type == "txt" and compress_text:
+        work_dir = _work_dir(file_path, settings)
+        target = os.path.join(work_dir, os.path.basename(file_path))
+        if not os.path.exists(target):
+            with open(file_path, "rb") as source, gzip.open(target + ".tmp", "wb", compresslevel=9) as output:
+                shutil.copyfileobj(source, output)
+            os.replace(target + ".tmp", target)
+        return PreparedUpload(
+            file_path, target, {"content_encoding": "gzip"}, legacy_path=file_path, work_dir=work_dir
+        )
+
+    return PreparedUpload(file_path, file_path)
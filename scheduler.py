@@ -0,0 +1,97 @@
+import threading
+
+
+class Poller:
+    """مهمة دورية تعمل في خيط واحد ويمكن إيقافها"""
+
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"poller-{name}", daemon=True)
+
+    def _run(self):
+        # wait تعود True فور طلب الإيقاف فلا ننتظر انتهاء الفترة كاملة
+        while not self.stop_event.wait(self.next_interval()):
+            try:
+                self.func()
+            except Exception:
+                pass
+
+    def next_interval(self):
+        # الفترة قد تكون دالة (مثل فترة طريقة نقل الشات الحالية)
+        return self.interval() if callable(self.interval) else self.interval
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    @property
+    def alive(self):
+        return self.thread.is_alive() and not self.stop_event.is_set()
+
+
+class PollerScheduler:
+    """يملك مهمة دورية واحدة على الأكثر لكل اسم خلال جلسة الصفحة"""
+
+    def __init__(self):
+        self._pollers = {}
+        self._lock = threading.Lock()
+
+    def start(self, name, func, interval):
+        # إيقاف أي مهمة سابقة بنفس الاسم قبل بدء الجديدة
+        with self._lock:
+            old = self._pollers.pop(name, None)
+            if old:
+                old.stop()
+            poller = Poller(name, func, interval)
+            self._pollers[name] = poller
+            poller.start()
+            return poller
+
+    def stop(self, name):
+        with self._lock:
+            poller = self._pollers.pop(name, None)
+        if poller:
+            poller.stop()
+
+    def stop_all(self):
+        with self._lock:
+            pollers = list(self._pollers.values())
+            self._pollers.clear()
+        for poller in pollers:
+            poller.stop()
+
+    def is_running(self, name):
+        poller = self._pollers.get(name)
+        return bool(poller and poller.alive)
+
+    def live_count(self):
+        return sum(1 for poller in list(self._pollers.values()) if poller.alive)
+
+
+class Debouncer:
+    """تأجيل تنفيذ الدالة حتى يتوقف الاستدعاء لمدة delay ثانية (مثل الكتابة في حقل البحث)"""
+
+    def __init__(self, delay, func):
+        self.delay = delay
+        self.func = func
+        self._timer = None
+        self._lock = threading.Lock()
+
+    def __call__(self, *args, **kwargs):
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.delay, self.func, args, kwargs)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def cancel(self):
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+            self._timer = None
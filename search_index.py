@@ -0,0 +1,78 @@
+import re
+from bisect import bisect_left
+
+# التشكيل والتطويل
+_TASHKEEL = re.compile("[ؐ-ًؚ-ٰٟۖ-ۭـ]")
+_FOLD = str.maketrans({
+    "أ": "ا",
+    "إ": "ا",
+    "آ": "ا",
+    "ٱ": "ا",
+    "ى": "ي",
+    "ئ": "ي",
+    "ؤ": "و",
+    "ة": "ه",
+})
+_TOKEN = re.compile(r"\w+")
+
+
+def normalize(text):
+    """توحيد النص العربي للبحث: حذف التشكيل وتوحيد الألف والياء والتاء المربوطة"""
+    return _TASHKEEL.sub("", str(text or "")).translate(_FOLD).lower()
+
+
+def tokenize(text):
+    return _TOKEN.findall(normalize(text))
+
+
+class SearchIndex:
+    """فهرس كلمات في الذاكرة يدعم البحث ببداية الكلمة"""
+
+    def __init__(self, fields, key):
+        self.fields = fields
+        self.key = key
+        self._postings = {}
+        self._tokens = []
+        self._order = []
+
+    def build(self, items):
+        self._postings = {}
+        self._order = []
+        return self.add(items)
+
+    def add(self, items):
+        """إضافة عناصر جديدة للفهرس دون إعادة بنائه (عند تحميل صفحة جديدة)"""
+        postings = self._postings
+        for item in items:
+            item_key = self.key(item)
+            self._order.append(item_key)
+            for field in self.fields:
+                for token in tokenize(getattr(item, field, "")):
+                    postings.setdefault(token, set()).add(item_key)
+                    # فهرسة الكلمة بدون "ال" التعريف أيضاً ليطابق البحث عن "ادب" كلمة "الأدب"
+                    if token.startswith("ال") and len(token) > 3:
+                        postings.setdefault(token[2:], set()).add(item_key)
+        self._tokens = sorted(postings)
+        return self
+
+    def _prefix_matches(self, prefix):
+        keys = set()
+        start = bisect_left(self._tokens, prefix)
+        for token in self._tokens[start:]:
+            if not token.startswith(prefix):
+                break
+            keys |= self._postings[token]
+        return keys
+
+    def search(self, query):
+        """مفاتيح العناصر التي تحتوي كل كلمات الاستعلام (كبداية كلمة) بترتيبها الأصلي"""
+        terms = tokenize(query)
+        if not terms:
+            return list(self._order)
+        matches = None
+        for term in terms:
+            keys = self._prefix_matches(term)
+            matches = keys if matches is None else matches & keys
+            if not matches:
+                return []
+        return [k for k in self._order if k in matches]
@@ -0,0 +1,9 @@
+import os
+
+
+def app_data_dir(*parts):
+    """مجلد بيانات التطبيق الدائم (يوفره Flet عند التغليف، وإلا مجلد في المنزل)"""
+    base = os.environ.get("FLET_APP_STORAGE_DATA") or os.path.join(os.path.expanduser("~"), ".alson_academy")
+    path = os.path.join(base, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
@@ -0,0 +1,78 @@
+import threading
+
+
+class ThumbnailLoader:
+    """الصور المصغرة للصفوف الظاهرة فقط: تحمل عند ظهور الصف وتلغى عند خروجه من الشاشة
+
+    fetch(item, cancel) تعيد الصورة المصغرة (base64) أو None، و cancel حدث يضبط عند الإلغاء.
+    on_show(key, data) تعرض الصورة في الصف، و on_hide(key) تعيد الأيقونة لتحرير ذاكرة الصفوف البعيدة.
+    """
+
+    def __init__(self, runner, fetch, cache, key, on_show, on_hide):
+        self.runner = runner
+        self.fetch = fetch
+        self.cache = cache
+        self.key = key
+        self.on_show = on_show
+        self.on_hide = on_hide
+        self._wanted = set()
+        self._shown = set()
+        self._failed = set()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def request(self, items):
+        """تحديد الصفوف الظاهرة حالياً"""
+        items = {self.key(item): item for item in items}
+        show, hide = [], []
+        with self._lock:
+            self._wanted = set(items)
+            for key in [k for k in self._inflight if k not in items]:
+                future, cancel = self._inflight.pop(key)
+                cancel.set()
+                future.cancel()
+            for key in [k for k in self._shown if k not in items]:
+                self._shown.discard(key)
+                hide.append(key)
+            for key, item in items.items():
+                if key in self._shown or key in self._inflight or key in self._failed:
+                    continue
+                data = self.cache.get(key)
+                if data is not None:
+                    self._shown.add(key)
+                    show.append((key, data))
+                    continue
+                cancel = threading.Event()
+                self._inflight[key] = (self.runner.submit(self._load, key, item, cancel), cancel)
+        for key in hide:
+            self.on_hide(key)
+        for key, data in show:
+            self.on_show(key, data)
+
+    def _load(self, key, item, cancel):
+        try:
+            data = self.fetch(item, cancel)
+        except Exception:
+            data = None
+        with self._lock:
+            if self._inflight.get(key, (None, None))[1] is cancel:
+                del self._inflight[key]
+            if cancel.is_set():
+                return
+            if data is None:
+                # لا نعيد المحاولة مع كل تمرير؛ تعاد عند فتح القائمة من جديد
+                self._failed.add(key)
+                return
+            self.cache[key] = data
+            if key not in self._wanted:
+                return
+            self._shown.add(key)
+        self.on_show(key, data)
+
+    def shown(self, key):
+        """الصورة المصغرة إذا كانت معروضة حالياً (لإعادة بناء الصف دون فقدها)"""
+        with self._lock:
+            return self.cache.get(key) if key in self._shown else None
+
+    def cancel_all(self):
+        self.request([])
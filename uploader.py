@@ -0,0 +1,244 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from storage import app_data_dir
+
+
+class UploadError(Exception):
+    """فشل الرفع بعد استنفاد المحاولات"""
+
+
+class UploadUnsupported(Exception):
+    """السيرفر لا يدعم الرفع المجزأ"""
+
+
+class UploadState:
+    """حفظ معرفات عمليات الرفع غير المكتملة على القرص لاستئنافها بعد الانقطاع"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(app_data_dir(), "uploads.json")
+        self._lock = threading.Lock()
+
+    def _read(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, data):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.path)
+
+    def get(self, key):
+        with self._lock:
+            return self._read().get(key)
+
+    def set(self, key, upload_id):
+        with self._lock:
+            data = self._read()
+            data[key] = upload_id
+            self._write(data)
+
+    def delete(self, key):
+        with self._lock:
+            data = self._read()
+            if data.pop(key, None) is not None:
+                self._write(data)
+
+
+class ChunkedUploader:
+    """رفع الملفات على أجزاء ثابتة الحجم تقرأ من القرص مباشرة، مع إعادة محاولة كل جزء واستئناف الرفع
+
+    البروتوكول (upload.php):
+      action=init      JSON بالبيانات → {"upload_id", "received"}
+      action=status    upload_id      → {"received"}
+      action=chunk     upload_id, offset، والجسم بايتات الجزء → {"received"}
+      action=complete  upload_id      → سجل المحتوى
+    """
+
+    def __init__(self, api, chunk_size=1024 * 1024, max_retries=5, backoff=1.0, state=None):
+        self.api = api
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.state = state or UploadState()
+        # None قبل أول رفع، ثم True أو False حسب رد السيرفر (لا نعيد فحصه في نفس الجلسة)
+        self.supported = None
+
+    def _post(self, params, retries=None, accept=None, **kwargs):
+        """طلب مع إعادة المحاولة عند أخطاء الاتصال أو أخطاء السيرفر المؤقتة
+
+        accept(response) اختيارية تقرر بعد إعادة المحاولة إن كان الرد مقبولاً رغم أنه خطأ.
+        """
+        import requests
+
+        query = "&".join(f"{k}={v}" for k, v in params.items())
+        retries = self.max_retries if retries is None else retries
+        for attempt in range(retries + 1):
+            try:
+                response = self.api.post(f"upload.php?{query}", endpoint="upload", **kwargs)
+                if attempt and accept and accept(response):
+                    return None
+                if response.status_code < 500:
+                    return response
+                error = UploadError(response.text)
+            except requests.RequestException as e:
+                error = e
+            if attempt < retries:
+                time.sleep(self.backoff * (2 ** attempt))
+        raise UploadError(str(error))
+
+    def _resume_key(self, file_path, fields):
+        stat = os.stat(file_path)
+        return "|".join([
+            os.path.abspath(file_path),
+            str(stat.st_size),
+            str(int(stat.st_mtime)),
+            str(fields.get("department", "")),
+            str(fields.get("division", "")),
+        ])
+
+    def _start(self, file_path, fields, size, key):
+        upload_id = self.state.get(key)
+        if upload_id:
+            response = self._post({"action": "status", "upload_id": upload_id})
+            if response.status_code == 200:
+                return upload_id, int(response.json().get("received", 0))
+            self.state.delete(key)
+
+        try:
+            # السيرفر القديم قد يرد على action=init المجهول بخطأ 5xx، فلا نطيل الفحص الأول
+            response = self._post(
+                {"action": "init"},
+                retries=1 if self.supported is None else None,
+                json={"filename": os.path.basename(file_path), "size": size, **fields},
+                headers={"Content-Type": "application/json"},
+            )
+        except UploadError as e:
+            self._unsupported()
+            raise UploadUnsupported(str(e))
+        try:
+            data = response.json() if response.status_code == 200 else None
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or "upload_id" not in data:
+            self._unsupported()
+            raise UploadUnsupported(response.text)
+        self.supported = True
+        self.state.set(key, data["upload_id"])
+        return data["upload_id"], int(data.get("received", 0))
+
+    def _unsupported(self):
+        # فشل init على سيرفر لم يثبت دعمه للرفع المجزأ: الرفع العادي لبقية الجلسة
+        if self.supported is None:
+            self.supported = False
+
+    def upload(self, file_path, fields, progress=None):
+        """يرفع الملف ويعيد استجابة الإكمال (أو None إذا اكتمل في محاولة ضاع ردها)؛ progress(نسبة من 0 إلى 1) اختيارية"""
+        if self.supported is False:
+            raise UploadUnsupported("chunked upload is not supported by the server")
+        size = os.path.getsize(file_path)
+        key = self._resume_key(file_path, fields)
+        upload_id, offset = self._start(file_path, fields, size, key)
+        if progress:
+            progress(offset / size if size else 1.0)
+
+        with open(file_path, "rb") as file:
+            while offset < size:
+                file.seek(offset)
+                chunk = file.read(self.chunk_size)
+                response = self._post(
+                    {"action": "chunk", "upload_id": upload_id, "offset": offset},
+                    data=chunk,
+                    headers={"Content-Type": "application/octet-stream"},
+                )
+                if response.status_code == 409:
+                    # الموضع لا يطابق ما استلمه السيرفر: نكمل من موضعه
+                    offset = int(response.json()["received"])
+                    continue
+                if response.status_code != 200:
+                    raise UploadError(response.text)
+                # السيرفر يحدد الموضع التالي (قد يختلف إذا استلم الجزء من قبل)
+                offset = int(response.json().get("received", offset + len(chunk)))
+                if progress:
+                    progress(offset / size)
+
+        # الإكمال لا يتكرر: السيرفر يحذف الرفع عند إكماله، فإذا لم يعرفه بعد محاولة ضاع ردها
+        # فقد اكتمل المحتوى في تلك المحاولة ولا يعتبر فشلاً
+        response = self._post(
+            {"action": "complete", "upload_id": upload_id},
+            accept=lambda response: response.status_code == 404 and self._is_gone(upload_id),
+        )
+        if response is not None and response.status_code != 200:
+            raise UploadError(response.text)
+        self.state.delete(key)
+        return response
+
+    def _is_gone(self, upload_id):
+        response = self._post({"action": "status", "upload_id": upload_id})
+        return response.status_code == 404
+
+
+class UploadJob:
+    """ملف واحد في طابور الرفع مع حالته"""
+
+    PENDING = "pending"
+    UPLOADING = "uploading"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, path, title, file_type):
+        self.path = path
+        self.title = title
+        self.file_type = file_type
+        self.status = self.PENDING
+        self.progress = 0.0
+        self.error = None
+
+    @classmethod
+    def from_path(cls, path):
+        # العنوان من اسم الملف بدون الامتداد، والنوع من الامتداد
+        name, ext = os.path.splitext(os.path.basename(path))
+        title = " ".join(name.replace("_", " ").replace("-", " ").split()) or name
+        return cls(path, title, ext.lstrip(".").lower())
+
+
+class UploadQueue:
+    """رفع عدة ملفات مع حد أقصى لعدد عمليات الرفع المتزامنة"""
+
+    def __init__(self, upload_file, max_concurrent=3):
+        """upload_file(job, progress) ترفع ملفاً واحداً وترمي استثناء عند الفشل"""
+        self.upload_file = upload_file
+        self.max_concurrent = max_concurrent
+
+    def _run_job(self, job, on_update):
+        def progress(value):
+            job.progress = value
+            if on_update:
+                on_update(job)
+
+        job.status = UploadJob.UPLOADING
+        if on_update:
+            on_update(job)
+        try:
+            self.upload_file(job, progress)
+            job.status = UploadJob.DONE
+            job.progress = 1.0
+        except Exception as e:
+            job.status = UploadJob.FAILED
+            job.error = str(e)
+        if on_update:
+            on_update(job)
+
+    def run(self, jobs, on_update=None):
+        """يرفع كل الملفات ويعود بعد انتهائها جميعاً (يستدعى من خيط في الخلفية)"""
+        with ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix="upload") as pool:
+            for future in [pool.submit(self._run_job, job, on_update) for job in jobs]:
+                future.result()
+        return jobs
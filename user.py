@@ -1,4 +1,11 @@
+import logging
+
+logger = logging.getLogger("alson")
+
+
 class User:
+    __slots__ = ("code", "username", "department", "division", "role")
+
     def __init__(self, code, username, department, division, role):
         self.code = code
         self.username = username
@@ -8,4 +15,19 @@ class User:
 
     @classmethod
     def from_json(cls, data):
-        return cls(data['code'], data['username'], data['department'], data['division'], data['role'])
\ No newline at end of file
+        return cls(data['code'], data['username'], data['department'], data['division'], data['role'])
+
+    def to_json(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_json_list(cls, items):
+        """تحويل قائمة كاملة في مرور واحد مع تجاهل السجلات الناقصة"""
+        result = []
+        append = result.append
+        for data in items:
+            try:
+                append(cls(data['code'], data['username'], data['department'], data['division'], data['role']))
+            except (KeyError, TypeError):
+                logger.warning("تجاهل سجل مستخدم غير صالح: %r", data)
+        return result
@@ -0,0 +1,156 @@
+import flet as ft
+
+
+class VirtualList:
+    """يبني صفوف ListView على دفعات عند التمرير ويبقي المبني منها حول الجزء الظاهر فقط
+
+    key(item) معرف ثابت للعنصر، و signature(item) قيمة تتغير عند تغير بيانات العنصر.
+    الصفوف البعيدة عن الشاشة (أكثر من keep صفاً) تستبدل بعنصر فارغ بارتفاع الصف التقريبي
+    فيبقى طول القائمة وموضع التمرير كما هما، وتبنى من جديد عند الاقتراب منها.
+    """
+
+    def __init__(self, list_view, build_row, key, signature, window=40, threshold=400, on_end_reached=None,
+                 on_visible_change=None, keep=None):
+        self.list_view = list_view
+        self.build_row = build_row
+        self.key = key
+        self.signature = signature
+        self.window = window
+        self.threshold = threshold
+        self.keep = keep if keep is not None else window
+        # تستدعى عند الوصول لنهاية العناصر المحلية (لتحميل صفحة جديدة من السيرفر)
+        self.on_end_reached = on_end_reached
+        # تستدعى بالعناصر الظاهرة على الشاشة تقريباً (لتحميل ما يلزمها فقط)
+        self.on_visible_change = on_visible_change
+        self.items = []
+        self.visible_count = 0
+        self._visible = (0, 10)
+        self._row_extent = None
+        # مواضع الصفوف المبنية فعلاً في list_view.controls (الباقي عناصر فارغة)
+        self._built = set()
+        self._rows = {}
+        list_view.on_scroll = self.on_scroll
+        list_view.on_scroll_interval = 100
+
+    def row(self, item):
+        key = self.key(item)
+        signature = self.signature(item)
+        cached = self._rows.get(key)
+        if cached and cached[0] == signature:
+            return cached[1]
+        control = self.build_row(item)
+        self._rows[key] = (signature, control)
+        return control
+
+    def _placeholder(self):
+        spacing = self.list_view.spacing or 0
+        return ft.Container(height=max(self._row_extent - spacing, 0))
+
+    def _window(self):
+        first, last = self._visible
+        if self._row_extent is None:
+            # قبل معرفة ارتفاع الصف تبنى كل الصفوف المعروضة
+            return range(self.visible_count)
+        return range(max(first - self.keep, 0), min(last + self.keep, self.visible_count))
+
+    def _control(self, index, window):
+        if index in window:
+            self._built.add(index)
+            return self.row(self.items[index])
+        return self._placeholder()
+
+    def set_items(self, items):
+        """استبدال العناصر المعروضة مع الاحتفاظ بعدد الصفوف المعروضة حالياً"""
+        self.items = list(items)
+        self.visible_count = min(len(self.items), max(self.visible_count, self.window))
+        window = self._window()
+        self._built = set()
+        self.list_view.controls = [self._control(index, window) for index in range(self.visible_count)]
+        self._drop_unbuilt_rows()
+        self._notify_visible()
+
+    def forget(self, keep_keys):
+        """حذف الصفوف المخزنة لعناصر لم تعد موجودة"""
+        for key in [k for k in self._rows if k not in keep_keys]:
+            del self._rows[key]
+
+    def load_more(self):
+        if self.visible_count >= len(self.items):
+            return False
+        start = self.visible_count
+        self.visible_count = min(len(self.items), start + self.window)
+        window = self._window()
+        self.list_view.controls.extend(self._control(index, window) for index in range(start, self.visible_count))
+        return True
+
+    def reveal(self, index):
+        """بناء الصف index ومحيطه قبل التمرير إليه (scroll_to يحتاج الصف الحقيقي بمفتاحه)"""
+        while self.visible_count <= index and self.load_more():
+            pass
+        if index >= self.visible_count:
+            return False
+        self._visible = (index, index + 1)
+        self._apply_window()
+        return True
+
+    def _apply_window(self):
+        """بناء الصفوف داخل النافذة واستبدال البعيدة بعناصر فارغة لتحرير ذاكرتها"""
+        if self._row_extent is None:
+            return False
+        window = self._window()
+        target = set(window)
+        controls = self.list_view.controls
+        changed = False
+        for index in self._built - target:
+            controls[index] = self._placeholder()
+            changed = True
+        for index in target - self._built:
+            controls[index] = self.row(self.items[index])
+            changed = True
+        self._built = target
+        if changed:
+            self._drop_unbuilt_rows()
+        return changed
+
+    def _drop_unbuilt_rows(self):
+        # لا نحتفظ إلا بصفوف النافذة الحالية؛ البقية تبنى من جديد عند الحاجة
+        keep_keys = {self.key(self.items[index]) for index in self._built}
+        self.forget(keep_keys)
+
+    def visible_items(self):
+        first, last = self._visible
+        return self.items[first:min(last, self.visible_count)]
+
+    def _notify_visible(self):
+        if self.on_visible_change:
+            self.on_visible_change(self.visible_items())
+
+    def _update_visible(self, e):
+        viewport = getattr(e, "viewport_dimension", None)
+        if not viewport or not self.visible_count:
+            return False
+        # ارتفاع تقريبي للصف من طول المحتوى المعروض، مع صفين احتياطيين من كل جهة
+        row_extent = (e.max_scroll_extent + viewport) / self.visible_count
+        if row_extent <= 0:
+            return False
+        if self._row_extent is None:
+            self._row_extent = row_extent
+        first = max(int(e.pixels // row_extent) - 2, 0)
+        last = int((e.pixels + viewport) // row_extent) + 3
+        if (first, last) == self._visible:
+            return False
+        self._visible = (first, last)
+        changed = self._apply_window()
+        self._notify_visible()
+        return changed
+
+    def on_scroll(self, e):
+        if e.max_scroll_extent is None or e.pixels is None:
+            return
+        changed = self._update_visible(e)
+        if e.pixels >= e.max_scroll_extent - self.threshold and self.load_more():
+            changed = True
+        elif e.pixels >= e.max_scroll_extent - self.threshold and self.on_end_reached:
+            self.on_end_reached()
+        if changed:
+            self.list_view.update()
@@ -0,0 +1,88 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TaskRunner:
+    """تنفيذ طلبات الشبكة في مجموعة خيوط محدودة بدلاً من حجز معالج أحداث الواجهة"""
+
+    def __init__(self, max_workers=8):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="api")
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, on_done=None, on_error=None, **kwargs):
+        future = self.executor.submit(func, *args, **kwargs)
+        with self._lock:
+            self._pending.add(future)
+
+        def callback(f):
+            with self._lock:
+                self._pending.discard(f)
+            if f.cancelled():
+                return
+            error = f.exception()
+            if error is not None:
+                if on_error:
+                    on_error(error)
+            elif on_done:
+                on_done(f.result())
+
+        future.add_done_callback(callback)
+        return future
+
+    @property
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+    def cancel_all(self):
+        """إلغاء المهام التي لم تبدأ بعد (المهام الجارية تكمل حتى تنتهي)"""
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        self.executor.shutdown(wait=False)
+
+
+class TaskGroup:
+    """مجموعة مهام تعمل بالتوازي ويمكن إلغاؤها معاً، مع قياس زمن كل مهمة"""
+
+    def __init__(self, runner):
+        self.runner = runner
+        self.futures = {}
+        self.timings = {}
+        self.elapsed = None
+        self.cancelled = False
+        self._lock = threading.Lock()
+
+    def start(self, jobs, on_complete=None):
+        """jobs: قاموس {الاسم: (الدالة، المعاملات)}"""
+        started = time.perf_counter()
+        remaining = [len(jobs)]
+
+        def finished(name):
+            with self._lock:
+                self.timings[name] = time.perf_counter() - started
+                remaining[0] -= 1
+                done = remaining[0] == 0
+                if done:
+                    self.elapsed = time.perf_counter() - started
+            if done and on_complete and not self.cancelled:
+                on_complete(self)
+
+        for name, (func, args) in jobs.items():
+            self.futures[name] = self.runner.submit(
+                func, *args,
+                on_done=lambda result, name=name: finished(name),
+                on_error=lambda error, name=name: finished(name),
+            )
+        return self
+
+    def cancel(self):
+        self.cancelled = True
+        for future in self.futures.values():
+            future.cancel()